@@ -0,0 +1,142 @@
+// Clientside callbacks that redraw a graph when only the selected variable changes.
+// The data is already in the browser in the intermediate dcc.Store, so the trace is
+// built here from the stored result and the styles of the variable, without a round
+// trip to the server. The styles are the registry in utils/variables.py, sent to the
+// browser in the variable-meta store.
+//
+// Every function returns the new figure, the value of the redraw store of the panel and
+// the position of the live mode in the figure. If the figure cannot be built here, e.g.
+// there is no result yet or the variable is not in it or the climatology is overlaid,
+// the figure is left alone and the redraw store asks the server to build it.
+//
+// The time steps the live mode appended are kept on the server with the result, not in
+// the stored result in the browser. A graph they were appended to is therefore always
+// redrawn by the server, see live_position in utils/live.py.
+
+(function () {
+    const noUpdate = window.dash_clientside.no_update;
+
+    // typed arrays of the plotly.js spec written by utils/binary.py
+    const ARRAYS = {
+        f4: Float32Array, f8: Float64Array, i1: Int8Array, u1: Uint8Array,
+        i2: Int16Array, u2: Uint16Array, i4: Int32Array, u4: Uint32Array
+    };
+
+    function decodeValue(value, time) {
+        if (value === null || Number.isNaN(value)) {
+            return null;
+        }
+        // times are milliseconds since 1970, written as iso strings like the json mode
+        return time ? new Date(value).toISOString().slice(0, -1) : value;
+    }
+
+    // Convert a stored array to a plain array, rows of 2-D arrays are arrays as well.
+    // Arrays of the json mode are returned unchanged.
+    function decode(values) {
+        if (values === null || values === undefined || values.bdata === undefined) {
+            return values;
+        }
+        const bytes = Uint8Array.from(atob(values.bdata), c => c.charCodeAt(0));
+        const flat = new ARRAYS[values.dtype](bytes.buffer);
+        const convert = v => decodeValue(v, values.time);
+        if (values.shape === undefined) {
+            return Array.from(flat, convert);
+        }
+        const [nrows, ncols] = values.shape.split(',').map(Number);
+        const rows = [];
+        for (let i = 0; i < nrows; i++) {
+            rows.push(Array.from(flat.subarray(i * ncols, (i + 1) * ncols), convert));
+        }
+        return rows;
+    }
+
+    // the figure on the page is only restyled, a figure without a trace is the error figure.
+    // The climatology overlay is read from the statistics on the server.
+    function canRedraw(variable, data, figure, climatology, live) {
+        return data && data.data && data.data[variable] !== undefined &&
+            figure && figure.data && figure.data.length > 0 &&
+            !(climatology && climatology.includes('overlay')) && !(live && live.appended);
+    }
+
+    function redraw() {
+        return [noUpdate, Date.now(), noUpdate];
+    }
+
+    // the figure with the last time step of the stored result, the live mode leaves a zoomed
+    // window alone, see live_position in utils/live.py
+    function drawn(trace, layout, data) {
+        const end = data.end === undefined ? null : data.end;
+        const live = end === null || data.window ? null : {key: data.key, end: end, appended: false};
+        return [{data: [trace], layout: Object.assign({}, layout, {meta: {end: end, appended: false}})},
+            noUpdate, live];
+    }
+
+    // contour of the selected levels of a (time, height) field, transposed like on the server
+    function contourTrace(data, variable, levelRange) {
+        const [first, last] = levelRange;
+        return {
+            type: 'contour',
+            x: decode(data.time),
+            y: decode(data.height_2).slice(first, last),
+            z: decode(data.data[variable]).map(row => row.slice(first, last)),
+            transpose: true
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        dashboard: {
+            vars1d_figure: function (variable, data, climatology, meta, figure, live) {
+                if (!canRedraw(variable, data, figure, climatology, live)) {
+                    return redraw();
+                }
+                const series = data.data[variable];
+                const trace = Object.assign({}, figure.data[0], {
+                    x: decode(series.time), y: decode(series.values)
+                });
+                // the range of the previous variable does not fit the new one
+                const layout = Object.assign({}, figure.layout, {
+                    yaxis: Object.assign({}, figure.layout.yaxis, {autorange: true, range: undefined})
+                });
+                const style = meta.vars1d[variable];
+                if (style !== undefined) {
+                    layout.yaxis.title = {text: style.yaxis_title};
+                }
+                return drawn(trace, layout, data);
+            },
+
+            timeheight_figure: function (variable, data, levelRange, climatology, meta, figure, live) {
+                if (!canRedraw(variable, data, figure, climatology, live)) {
+                    return redraw();
+                }
+                const style = meta.timeheight[variable];
+                const trace = Object.assign(contourTrace(data, variable, levelRange), {
+                    colorscale: style.colorscale, colorbar: {title: {text: style.colorbar}}
+                });
+                if (style.zmid !== null) {
+                    trace.zmid = style.zmid;
+                }
+                return drawn(trace, figure.layout, data);
+            },
+
+            hydrometeors_figure: function (variable, data, levelRange, meta, figure, live) {
+                if (!canRedraw(variable, data, figure, undefined, live)) {
+                    return redraw();
+                }
+                const style = meta.hydrometeors[variable];
+                const trace = Object.assign(contourTrace(data, variable, levelRange), {
+                    colorscale: meta.hydrometeors_colorscale, coloraxis: 'coloraxis'
+                });
+                if (style.contours !== null) {
+                    trace.contours = style.contours;
+                }
+                // the colors of the previous variable are computed again for the new one
+                const layout = Object.assign({}, figure.layout, {
+                    coloraxis: Object.assign({}, figure.layout.coloraxis, {
+                        colorbar: {title: {text: style.colorbar}}, cmin: undefined, cmax: undefined
+                    })
+                });
+                return drawn(trace, layout, data);
+            }
+        }
+    });
+})();
@@ -0,0 +1,67 @@
+""" Compare the vectorized hydrometeor transform with the former data frame implementation
+
+Usage: python -m benchmarks.bench_hydrometeors [--n-time 1440] [--n-levels 150] [--repeat 5]
+"""
+
+import argparse
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import xarray as xr
+
+from utils.derived_fields import MASS_SPECIES, NUMBER_SPECIES, transform_hydrometeors
+from .synthetic import make_meteogram
+
+
+def dataframe_transform(ds):
+    """ The former implementation, long format data frame with loops and masked assignments """
+    df = ds.to_dataframe().reset_index()
+    df['total mass'] = 0
+    for var in MASS_SPECIES:
+        df['total mass'] += df[var]
+    df['total number'] = 0
+    for var in NUMBER_SPECIES:
+        df['total number'] += df[var]
+    for varname in MASS_SPECIES + ['total mass', 'total number']:
+        df.loc[df[varname] < 1e-8, varname] = -9
+        df.loc[df[varname] >= 1e-8, varname] = np.log10(df.loc[df[varname] >= 1e-8, varname].values)
+    return df
+
+
+def vectorized_transform(ds):
+    """ The current implementation on a stacked (species, time, height) array """
+    names = list(ds.data_vars)
+    stack = ds.to_array('species').transpose('species', 'time', 'height_2').values
+    return transform_hydrometeors(names, stack)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n-time', type=int, default=1440, help='time steps of the synthetic day')
+    parser.add_argument('--n-levels', type=int, default=150, help='height_2 levels')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = make_meteogram(os.path.join(tmpdir, 'meteogram.nc'), n_time=args.n_time,
+                                  n_levels=args.n_levels, variables=MASS_SPECIES + NUMBER_SPECIES)
+        ds = xr.load_dataset(filename)
+
+    # both implementations must give the same fields
+    df = dataframe_transform(ds)
+    fields = vectorized_transform(ds)
+    for name, values in fields.items():
+        np.testing.assert_allclose(values.ravel(), df[name].values)
+
+    results = {}
+    for name, func in [('data frame', dataframe_transform), ('vectorized', vectorized_transform)]:
+        results[name] = min(timeit.repeat(lambda: func(ds), number=1, repeat=args.repeat))
+        print('{:<12} {:8.1f} ms'.format(name, results[name] * 1000))
+    print('speedup      {:8.1f}x  ({} time steps, {} levels, {} species)'.format(
+        results['data frame'] / results['vectorized'], args.n_time, args.n_levels, len(ds.data_vars)))
+
+
+if __name__ == '__main__':
+    main()
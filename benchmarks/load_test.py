@@ -0,0 +1,196 @@
+""" Load test of a running dashboard with concurrent simulated users changing the date
+
+Every simulated user selects a random date and then calls the callbacks the browser calls
+after a date change: the data callback of each panel, followed by the graph callbacks
+that read its result. The callbacks are found through the dependencies the Dash server
+publishes, so the test follows the layout of the running app. The latency of every
+callback and of the whole date change is reported.
+
+Usage: python -m benchmarks.load_test [--url http://127.0.0.1:8050] [--users 8]
+                                      [--changes 10] [--dates 2021-09-09 2021-09-10]
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from utils.config_utils import load_config
+from utils.dataset_cache import list_meteogram_files
+
+
+def layout_values(component, values : dict = None) -> dict:
+    """ Initial values of the properties of all components with an id
+
+    :param component: layout as returned by /_dash-layout
+    :param values: dictionary the values are added to
+    :return: dictionary keyed by 'id.property'
+    """
+    if values is None:
+        values = {}
+    if isinstance(component, list):
+        for child in component:
+            layout_values(child, values)
+    elif isinstance(component, dict) and 'props' in component:
+        props = component['props']
+        if 'id' in props:
+            for name, value in props.items():
+                if name not in ('id', 'children'):
+                    values['{}.{}'.format(props['id'], name)] = value
+        layout_values(props.get('children'), values)
+    return values
+
+
+def parse_outputs(output : str):
+    """ Outputs of a callback in the format of the update request
+
+    :param output: output string of the dependencies, '..a.b...c.d..' for several outputs
+    :return: dictionary of a single output or list of dictionaries
+    """
+    def parse(name):
+        component, prop = name.rsplit('.', 1)
+        # outputs with allow_duplicate carry a hash after the property
+        return {'id': component, 'property': prop.split('@')[0]}
+    if output.startswith('..'):
+        return [parse(name) for name in output.strip('.').split('...')]
+    return parse(output)
+
+
+class User:
+    """ A simulated browser session """
+
+    def __init__(self, url : str, dependencies : list, values : dict):
+        """
+        :param url: address of the dashboard
+        :param dependencies: callbacks as returned by /_dash-dependencies
+        :param values: initial values of the layout, copied for this user
+        """
+        self.url = url.rstrip('/')
+        self.dependencies = dependencies
+        self.values = dict(values)
+        self.session = requests.Session()
+
+    def call(self, dependency : dict, changed : list):
+        """ Call a callback with the current values and remember the values it returns
+
+        :param dependency: the callback
+        :param changed: 'id.property' of the inputs that changed
+        :return: latency in seconds and the HTTP status code
+        """
+        def args(items):
+            return [{'id': item['id'], 'property': item['property'],
+                     'value': self.values.get('{}.{}'.format(item['id'], item['property']))} for item in items]
+        body = {'output': dependency['output'], 'outputs': parse_outputs(dependency['output']),
+                'inputs': args(dependency['inputs']), 'state': args(dependency.get('state', [])),
+                'changedPropIds': changed}
+        start = time.perf_counter()
+        response = self.session.post(self.url + '/_dash-update-component', json=body)
+        seconds = time.perf_counter() - start
+        if response.status_code == 200:
+            for component, props in response.json()['response'].items():
+                for name, value in props.items():
+                    self.values['{}.{}'.format(component, name)] = value
+        return seconds, response.status_code
+
+    def change_date(self, seldate : str, record):
+        """ Select a date and call every callback that depends on it, then the callbacks
+        that depend on their outputs, like the browser does
+
+        :param seldate: date as YYYY-MM-DD
+        :param record: function called with the name, latency and status of every call
+        """
+        self.values['datepicker.date'] = seldate
+        changed = ['datepicker.date']
+        called = set()
+        start = time.perf_counter()
+        while changed:
+            current, changed = changed, []
+            for dependency in self.dependencies:
+                if dependency['output'] in called or dependency.get('clientside_function'):
+                    continue
+                inputs = ['{}.{}'.format(item['id'], item['property']) for item in dependency['inputs']]
+                triggers = [name for name in inputs if name in current]
+                if not triggers:
+                    continue
+                called.add(dependency['output'])
+                seconds, status = self.call(dependency, changed=triggers)
+                record(dependency['output'], seconds, status)
+                if status == 200:
+                    outputs = parse_outputs(dependency['output'])
+                    for output in outputs if isinstance(outputs, list) else [outputs]:
+                        changed.append('{}.{}'.format(output['id'], output['property']))
+        record('date change', time.perf_counter() - start, 200)
+
+
+def run(args) -> dict:
+    """ Run the simulated users against the dashboard
+
+    :param args: parsed command line arguments
+    :return: latencies in seconds and error counts keyed by callback output
+    """
+    url = args.url.rstrip('/')
+    values = layout_values(requests.get(url + '/_dash-layout').json())
+    dependencies = requests.get(url + '/_dash-dependencies').json()
+
+    dates = args.dates
+    if not dates:
+        config = load_config(args.config)
+        dates = list(list_meteogram_files(config, values.get('path.value') or config['paths']['data']))
+    if not dates:
+        raise SystemExit('no dates to select, pass --dates or set paths.data in the configuration')
+
+    latencies, errors = {}, {}
+    lock = threading.Lock()
+
+    def record(name, seconds, status):
+        with lock:
+            if status >= 400:
+                errors[name] = errors.get(name, 0) + 1
+            else:
+                latencies.setdefault(name, []).append(seconds)
+
+    def simulate(index):
+        user = User(url, dependencies, values)
+        rng = random.Random(args.seed + index)
+        for _ in range(args.changes):
+            user.change_date(rng.choice(dates), record)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as executor:
+        list(executor.map(simulate, range(args.users)))
+    return {'seconds': time.perf_counter() - start, 'latencies': latencies, 'errors': errors}
+
+
+def report(results : dict, args):
+    """ Print the latencies of every callback and the throughput of the date changes """
+    print('{:<70} {:>6} {:>9} {:>9} {:>9} {:>7}'.format('callback', 'calls', 'p50 ms', 'p95 ms', 'max ms', 'errors'))
+    names = list(results['latencies']) + [name for name in results['errors'] if name not in results['latencies']]
+    for name in names:
+        seconds = sorted(results['latencies'].get(name, [])) or [0.0]
+        p95 = seconds[min(len(seconds) - 1, int(round(0.95 * (len(seconds) - 1))))]
+        print('{:<70} {:>6} {:>9.1f} {:>9.1f} {:>9.1f} {:>7}'.format(
+            name[:70], len(results['latencies'].get(name, [])), statistics.median(seconds) * 1000,
+            p95 * 1000, seconds[-1] * 1000, results['errors'].get(name, 0)))
+    changes = len(results['latencies'].get('date change', []))
+    print('{} users, {} date changes in {:.1f} s, {:.2f} date changes/s'.format(
+        args.users, changes, results['seconds'], changes / results['seconds']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help='address of the running dashboard')
+    parser.add_argument('--users', type=int, default=8, help='number of concurrent simulated users')
+    parser.add_argument('--changes', type=int, default=10, help='date changes per user')
+    parser.add_argument('--dates', nargs='*', help='dates to select, default all dates in the data directory')
+    parser.add_argument('--config', default='./assets/config.toml', help='configuration used to find the dates')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random dates')
+    args = parser.parse_args()
+    report(run(args), args)
+
+
+if __name__ == '__main__':
+    main()
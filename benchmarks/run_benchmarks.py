@@ -0,0 +1,169 @@
+""" Benchmark the data and graph callbacks of the dashboard on synthetic meteogram files
+
+Every data callback (get_data, get_precip_data, get_timeheight_data, get_hydrometeors_data)
+and every graph callback is timed on its own, together with the peak memory it allocates
+and the size of the payload it sends to the browser. Results can be written to a json file
+and compared with the results of another commit.
+
+Usage: python -m benchmarks.run_benchmarks [--n-time 1440] [--n-levels 150] [--output results.json]
+                                           [--compare baseline.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import plotly
+from plotly.utils import PlotlyJSONEncoder
+
+from callbacks.vars1d_callbacks import load_vars1d, build_vars1d_figure
+from callbacks.precip_callbacks import load_precip, build_precip_figure
+from callbacks.time_height_callbacks import load_timeheight, build_timeheight_figure
+from callbacks.hydrometeors_callbacks import load_hydrometeors, build_hydrometeors_figure
+from utils.dataset_cache import get_dataset_cache, meteogram_path
+from utils.result_store import result_key, store_result, load_result
+from .synthetic import make_meteogram, VARS_1D, VARS_2D
+
+DATE = '2021-09-09'
+LEVEL_RANGE = [50, 150]
+
+# panel name, function reading the data and function building the figure
+PANELS = [
+    ('vars1d', load_vars1d, lambda grid: build_vars1d_figure(grid, 'T2M')),
+    ('precip', load_precip, build_precip_figure),
+    ('timeheight', load_timeheight, lambda grid: build_timeheight_figure(grid, 'T', LEVEL_RANGE)),
+    ('hydrometeors', load_hydrometeors, lambda grid: build_hydrometeors_figure(grid, 'total mass', LEVEL_RANGE)),
+]
+CALLBACK_NAMES = {'vars1d': ('get_data', 'graph_update_vars1d'),
+                  'precip': ('get_precip_data', 'precip_graph_update'),
+                  'timeheight': ('get_timeheight_data', 'timeheight_graph_update'),
+                  'hydrometeors': ('get_hydrometeors_data', 'hydrometeors_graph_update')}
+
+
+def measure(func, repeat : int, setup=None) -> dict:
+    """ Time a function and record the peak memory it allocates
+
+    :param func: function without arguments, its return value is the payload
+    :param repeat: number of timed runs
+    :param setup: optional function called before every run, e.g. to clear caches
+    :return: dictionary with min and median wall time in ms, peak memory in MB and payload bytes
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        payload = func()
+        times.append((time.perf_counter() - start) * 1000)
+    # memory is traced in a separate run, tracing slows down the timed runs
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    payload_bytes = len(payload if isinstance(payload, str) else json.dumps(payload, cls=PlotlyJSONEncoder))
+    return {'min_ms': min(times), 'median_ms': statistics.median(times),
+            'peak_mb': peak / 1024**2, 'payload_bytes': payload_bytes}
+
+
+def run(args) -> dict:
+    """ Run all benchmarks on a synthetic meteogram file
+
+    :param args: parsed command line arguments
+    :return: dictionary with the settings and the result of every callback
+    """
+    config = {'paths': {'prefix_meteogram': 'METEOGRAM_patch001_', 'postfix_meteogram': '_koeln'},
+              'store': {'mode': args.store}, 'cache': {'lazy': args.lazy}}
+    variables = args.variables.split(',') if args.variables else VARS_1D + VARS_2D
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = meteogram_path(config, tmpdir, DATE)
+        make_meteogram(filename, DATE, n_time=args.n_time, n_levels=args.n_levels, variables=variables)
+        cache = get_dataset_cache(config)
+        for name, load, build in PANELS:
+            data_name, graph_name = CALLBACK_NAMES[name]
+            key = result_key(filename, name)
+
+            # the data callback opens the file again every time, the file cache is cleared
+            def data_callback():
+                return store_result(config, key, load(config, filename))
+            try:
+                results[data_name] = measure(data_callback, args.repeat, setup=cache.clear)
+            except KeyError as err:
+                print('skipping {}, variable {} is missing'.format(name, err))
+                continue
+
+            payload = data_callback()
+
+            def graph_callback():
+                return build(load_result(config, payload)).to_json()
+            results[graph_name] = measure(graph_callback, args.repeat)
+        cache.clear()
+    return {'settings': {'n_time': args.n_time, 'n_levels': args.n_levels, 'variables': variables,
+                         'store': args.store, 'lazy': args.lazy, 'repeat': args.repeat},
+            'environment': environment(), 'results': results}
+
+
+def environment() -> dict:
+    """ Describe where the benchmark ran, so that results of different commits can be matched """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ''
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'plotly': plotly.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+
+def report(results : dict, baseline : dict = None):
+    """ Print the results as a table, optionally with the ratio to a baseline
+
+    :param results: results returned by run
+    :param baseline: results of an earlier run to compare with
+    """
+    header = '{:<28} {:>10} {:>10} {:>10} {:>12}'.format('callback', 'min ms', 'median ms', 'peak MB', 'payload KB')
+    if baseline:
+        header += ' {:>10}'.format('vs base')
+    print(header)
+    for name, result in results['results'].items():
+        line = '{:<28} {:>10.1f} {:>10.1f} {:>10.1f} {:>12.1f}'.format(
+            name, result['min_ms'], result['median_ms'], result['peak_mb'], result['payload_bytes'] / 1024)
+        if baseline and name in baseline['results']:
+            line += ' {:>9.2f}x'.format(baseline['results'][name]['min_ms'] / result['min_ms'])
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n-time', type=int, default=1440, help='time steps of the synthetic day')
+    parser.add_argument('--n-levels', type=int, default=150, help='height_2 levels')
+    parser.add_argument('--variables', help='comma separated variables to write, default all')
+    parser.add_argument('--store', default='client', choices=['client', 'server', 'binary'],
+                        help='mode of the result store, see [store] in config.toml')
+    parser.add_argument('--lazy', action='store_true', help='open the file in chunks with dask')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs')
+    parser.add_argument('--output', help='write the results to this json file')
+    parser.add_argument('--compare', help='json file of an earlier run to compare with')
+    args = parser.parse_args()
+
+    results = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
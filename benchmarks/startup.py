@@ -0,0 +1,130 @@
+""" Benchmark the startup of a dashboard worker
+
+Every run starts a fresh interpreter that imports app.py, builds the app with create_app
+and requests the page and its layout, like the first browser hitting a new worker. The
+time of every step, the heavy packages that are loaded when the layout is served and the
+packages that take longest to import are reported.
+
+Usage: python -m benchmarks.startup [--repeat 5] [--config assets/config.toml]
+                                    [--output startup.json] [--compare baseline.json]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from .run_benchmarks import environment
+
+# packages that should only be loaded when the first data is read
+HEAVY_PACKAGES = ['xarray', 'netCDF4', 'h5netcdf', 'h5py', 'scipy', 'dask', 'zarr']
+
+# modules of the dashboard, left out of the slowest imports
+LOCAL_MODULES = ['app', 'layout', 'utils', 'callbacks']
+
+# run in a fresh interpreter, prints the timings as json on the last line
+SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+dash_app = app.create_app({config!r})
+created = time.perf_counter()
+client = dash_app.server.test_client()
+assert client.get('/').status_code == 200
+assert client.get('/_dash-layout').status_code == 200
+served = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - start) * 1000, 'create_ms': (created - imported) * 1000,
+                  'layout_ms': (served - created) * 1000, 'ready_ms': (served - start) * 1000,
+                  'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+
+def import_times(stderr : str, top : int = 10) -> list:
+    """ Packages that take longest to import, from the output of python -X importtime
+
+    :param stderr: standard error of the interpreter
+    :param top: number of packages returned
+    :return: list of the package name and its cumulative import time in ms, a package
+        imported by another one is counted in both
+    """
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        # packages only, not their submodules and not the modules of the dashboard
+        if '.' in name or name.startswith('_') or name in LOCAL_MODULES:
+            continue
+        packages[name] = int(cumulative) / 1000
+    return sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+
+def run(args) -> dict:
+    """ Start the dashboard in fresh interpreters
+
+    :param args: parsed command line arguments
+    :return: dictionary with the timings of every run, the loaded heavy packages and the slowest imports
+    """
+    script = SCRIPT.format(config=args.config, heavy=HEAVY_PACKAGES)
+    runs = []
+    stderr = ''
+    for i in range(args.repeat):
+        # the import times are only recorded in the last run, recording them slows down the import
+        command = [sys.executable] + (['-X', 'importtime'] if i == args.repeat - 1 else []) + ['-c', script]
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        if i == args.repeat - 1:
+            stderr = result.stderr
+        else:
+            runs.append(json.loads(result.stdout.splitlines()[-1]))
+    results = {name: {'min_ms': min(run[name] for run in runs),
+                      'median_ms': statistics.median(run[name] for run in runs)}
+               for name in ['import_ms', 'create_ms', 'layout_ms', 'ready_ms']}
+    return {'settings': {'repeat': len(runs), 'config': args.config}, 'environment': environment(),
+            'results': results, 'loaded': runs[-1]['loaded'], 'imports': import_times(stderr)}
+
+
+def report(results : dict, baseline : dict = None):
+    """ Print the results as a table, optionally with the ratio to a baseline
+
+    :param results: results returned by run
+    :param baseline: results of an earlier run to compare with
+    """
+    header = '{:<12} {:>10} {:>10}'.format('step', 'min ms', 'median ms')
+    if baseline:
+        header += ' {:>10}'.format('vs base')
+    print(header)
+    for name, result in results['results'].items():
+        line = '{:<12} {:>10.1f} {:>10.1f}'.format(name[:-3], result['min_ms'], result['median_ms'])
+        if baseline and name in baseline['results']:
+            line += ' {:>9.2f}x'.format(baseline['results'][name]['min_ms'] / result['min_ms'])
+        print(line)
+    print('heavy packages loaded when the layout is served: {}'.format(', '.join(results['loaded']) or 'none'))
+    print('slowest imports: ' + ', '.join('{} {:.0f} ms'.format(name, ms) for name, ms in results['imports']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh interpreters')
+    parser.add_argument('--config', default='./assets/config.toml', help='configuration passed to create_app')
+    parser.add_argument('--output', help='write the results to this json file')
+    parser.add_argument('--compare', help='json file of an earlier run to compare with')
+    args = parser.parse_args()
+    # one more interpreter records the import times
+    args.repeat = max(args.repeat, 1) + 1
+
+    results = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
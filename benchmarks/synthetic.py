@@ -0,0 +1,41 @@
+""" Synthetic ICON-like meteogram files for the benchmarks """
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from utils.derived_fields import MASS_SPECIES, NUMBER_SPECIES
+
+VARS_1D = ['T2M', 'P_SFC', 'TQV', 'TQC', 'TQI', 'RAIN_GSP', 'RAIN_CON', 'SNOW_GSP', 'SNOW_CON']
+VARS_2D = ['CLC', 'T', 'RHO', 'P', 'REL_HUM', 'U', 'V'] + MASS_SPECIES + NUMBER_SPECIES
+
+
+def make_meteogram(filename : str, date : str = '2021-09-09', n_time : int = 1440, n_levels : int = 150,
+                   variables : list = None, seed : int = 0) -> str:
+    """ Write a meteogram file with the layout the dashboard expects
+
+    :param filename: path of the netcdf file to write
+    :param date: first day of the time axis as YYYY-MM-DD
+    :param n_time: number of time steps during one day
+    :param n_levels: number of height_2 levels
+    :param variables: variables to write, defaults to all variables used by the dashboard
+    :param seed: seed of the random values
+    :return: filename
+    """
+    rng = np.random.default_rng(seed)
+    time = pd.date_range(date, periods=n_time, freq=pd.Timedelta(days=1) / n_time)
+    # ICON counts the levels from the model top downwards
+    height = np.linspace(21000, 20, n_levels)
+    data = {}
+    for var in variables or VARS_1D + VARS_2D:
+        if var in VARS_1D:
+            data[var] = (('time',), rng.random(n_time))
+        elif var in MASS_SPECIES or var in NUMBER_SPECIES:
+            # hydrometeors are zero in most of the column
+            values = rng.lognormal(-12, 3, (n_time, n_levels))
+            values[rng.random((n_time, n_levels)) < 0.6] = 0
+            data[var] = (('time', 'height_2'), values)
+        else:
+            data[var] = (('time', 'height_2'), rng.random((n_time, n_levels)))
+    xr.Dataset(data, coords={'time': time, 'height_2': height}).to_netcdf(filename)
+    return filename
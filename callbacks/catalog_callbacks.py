@@ -0,0 +1,42 @@
+from dash.dependencies import Input, Output
+
+from utils.catalog import get_catalog
+from utils.variables import VARS_1D, VARS_TIMEHEIGHT, VARS_HYDROMETEORS, dropdown_options, with_derived
+
+
+def get_callbacks_catalog(app, config):
+    @app.callback(Output(component_id='datepicker', component_property='disabled_days'),
+                Output(component_id='datepicker', component_property='min_date_allowed'),
+                Output(component_id='datepicker', component_property='max_date_allowed'),
+                Output(component_id='daterange', component_property='disabled_days'),
+                Output(component_id='daterange', component_property='min_date_allowed'),
+                Output(component_id='daterange', component_property='max_date_allowed'),
+                Input(component_id='path', component_property='value'))
+    def update_available_dates(path):
+        """ Only allow the dates that have a meteogram file in the data directory
+
+        :param path: path to the data
+        :return: disabled days, first and last allowed date of both date pickers
+        """
+        catalog = get_catalog(config, path)
+        dates = list(catalog.files())
+        disabled_days = catalog.disabled_days()
+        first, last = (dates[0], dates[-1]) if dates else (None, None)
+        return disabled_days, first, last, disabled_days, first, last
+
+    @app.callback(Output(component_id='dropdown_vars1d', component_property='options'),
+                Output(component_id='dropdown_timeheight', component_property='options'),
+                Output(component_id='dropdown_hydrometeors', component_property='options'),
+                Input(component_id='path', component_property='value'))
+    def update_variable_options(path):
+        """ Only offer the variables that exist in the data directory
+
+        :param path: path to the data
+        :return: options of the dropdown menus of the 1D, time-height and hydrometeor panels
+        """
+        available = with_derived(get_catalog(config, path).variables())
+        # without any file every variable is offered, the graphs show the error figure
+        if not available:
+            available = None
+        return (dropdown_options(VARS_1D, available), dropdown_options(VARS_TIMEHEIGHT, available),
+                dropdown_options(VARS_HYDROMETEORS, available))
@@ -0,0 +1,16 @@
+from dash.dependencies import Input, Output
+
+
+def get_callbacks_dates(app, config):
+    @app.callback(Output(component_id='datepicker_div', component_property='style'),
+                Output(component_id='daterange_div', component_property='style'),
+                Input(component_id='date_mode', component_property='value'))
+    def toggle_date_pickers(date_mode):
+        """ Show the date picker of the selected mode
+
+        :param date_mode: 'single' or 'range'
+        :return: styles of the single date picker and of the date range picker
+        """
+        if date_mode == 'range':
+            return {'display': 'none'}, {'display': 'block'}
+        return {'display': 'block'}, {'display': 'none'}
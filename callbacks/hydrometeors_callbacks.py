@@ -1,120 +1,181 @@
-import xarray as xr
-import pandas as pd
+import time
+
 import plotly.graph_objects as go
-from dash.dependencies import Input, Output
-from datetime import datetime
-import numpy as np
-from io import StringIO
+from dash import ctx, no_update
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 
 from .style_functions import style_figure, style_error
-from utils.error_utils import var_exists
+from utils.catalog import available_variables
+from utils.dataset_cache import get_dataset_cache
+from utils.derived_fields import MASS_SPECIES, NUMBER_SPECIES, transform_hydrometeors
+from utils.variables import STYLE_HYDROMETEORS
+from utils.date_range import ignores_trigger, selected_files, load_files
+from utils.result_store import result_key, has_result, store_result, result_reference, result_window, result_missing
+from utils.shared_cache import shared_result
+from utils.figure_cache import cached_figure, clientside_figures
+from utils.live import live_position
+from utils.lod import lod_config, changes_time_axis, time_window, select_window, last_time, decimation_factor, reduce_blocks, block_times
+
+
+def load_hydrometeors(config, filename, window=None):
+    """ Read the hydrometeors of a meteogram file, add the totals and convert the
+    mass fields to log10
+
+    :param config: app configuration
+    :param filename: path to the meteogram file
+    :param window: optional time window that is read at full resolution
+    :return: gridded data with time and height_2 axes and a (time, height) array per variable
+    """
+    lod = lod_config(config)
+    ds = get_dataset_cache(config).get(filename)
+    # only variables that exist are used, totals precomputed in a sidecar are read as well
+    var_list = available_variables(config, filename, MASS_SPECIES + NUMBER_SPECIES + ['total mass', 'total number'])
+
+    # the full column is kept, the level range is applied when the figure is built
+    ds_sub = select_window(ds[var_list], window)
+    # combine time steps in blocks so that each contour stays within the point budget
+    factor = decimation_factor(ds_sub.sizes['time'], ds_sub.sizes['height_2'], lod['max_points_2d'])
+    data = {}
+    if var_list:
+        # all species as one (species, time, height) array, so that the totals and the
+        # log transform are computed in a single vectorized pass
+        stack = ds_sub.to_array('species').transpose('species', 'time', 'height_2')
+        stack = reduce_blocks(stack, factor, lod['reduce_2d'])
+        data = transform_hydrometeors(var_list, stack)
+    # keep the (time, height_2) fields as 2-D arrays with 1-D axes instead of a long data frame
+    return {'time': block_times(ds_sub.time.values, factor), 'height_2': ds_sub.height_2.values, 'data': data,
+            'end': last_time(ds_sub.time.values)}
+
+
+def build_hydrometeors_figure(grid, dropdown_value, level_range):
+    """ Create the hydrometeor contour plot of a variable
+
+    :param grid: gridded data returned by load_hydrometeors
+    :param dropdown_value: selected variable
+    :param level_range: selected range of level indices
+    :return: plotly figure
+    """
+    # check if the variable is in the data, if not use default error plot
+    if grid is None or dropdown_value not in grid['data']:
+        fig = go.Figure()
+        fig = style_error(fig)
+        return fig
+
+    # moving the level slider only slices the cached full column instead of reading the file again
+    levels = slice(level_range[0], level_range[1])
+    # create contourplot, z is stored as (time, height) so it is transposed by plotly
+    fig = go.Figure(data=
+            go.Contour(z=grid['data'][dropdown_value][:, levels], x=grid['time'], y=grid['height_2'][levels],
+                transpose=True, colorscale='jet', coloraxis='coloraxis'))
+
+    # colorbar title and contour levels of the variable, shared with the clientside callback
+    style = STYLE_HYDROMETEORS[dropdown_value]
+    # add log scale limits for mass
+    if style['contours'] is not None:
+        fig.update_traces(contours=style['contours'])
+
+    # apply styling to the figure
+    fig = style_figure(fig)
+    fig.update_layout(title='',
+                        xaxis_title='Time [UTC]',
+                        yaxis_title='Height [m]'
+                        )
+
+    # update settings for colorbar
+    fig.update_layout(
+        coloraxis_colorbar=dict(
+            title=style['colorbar'],
+            ),
+        )
+
+    return fig
+
 
 def get_callbacks_hydrometeors(app, config):
 
     @app.callback(Output(component_id='intermediate-ds-hydrometeors', component_property='data'),
                 Input(component_id='datepicker', component_property='date'),
                 Input(component_id='path', component_property='value'),
-                Input(component_id='height_slider', component_property='value'))
-    def get_hydrometeors_data(seldate, path, level_range):
-        """ Get hydrometeor data for the selected date and height range
-        
+                Input(component_id='hydrometeors_plot', component_property='relayoutData'),
+                Input(component_id='date_mode', component_property='value'),
+                Input(component_id='daterange', component_property='start_date'),
+                Input(component_id='daterange', component_property='end_date'),
+                Input(component_id='reload-hydrometeors', component_property='data'),
+                State(component_id='intermediate-ds-hydrometeors', component_property='data'))
+    def get_hydrometeors_data(seldate, path, relayout_data, date_mode, start_date, end_date, reload, stored):
+        """ Get hydrometeor data of the full column for the selected date
+
         :param seldate: selected date
         :param path: path to the data
-        :param level_range: selected height range
-        :return: json data set with hydrometeors
+        :param relayout_data: zoom of the hydrometeor plot, a zoomed time window is read at full resolution
+        :param date_mode: 'single' for the selected date or 'range' for the selected date range
+        :param start_date: first date of the range
+        :param end_date: last date of the range
+        :param reload: set by the graph callback if the result was evicted from the server side store
+        :param stored: current content of the intermediate store, its time window is loaded again
+        :return: json data set with hydrometeors or its key in the server side store
         """
-        # convert date to YYYYMMDD format
-        seldate = datetime.strptime(seldate, '%Y-%m-%d').strftime('%Y%m%d')
-
-        ds = xr.open_dataset(
-            path+'/'+ config['paths']['prefix_meteogram'] + seldate + config['paths']['postfix_meteogram']+'.nc')
-        # only get up to around 12 km height and every 6th time step to reduce data size for speedup
-        var_list_mass = ['QV', 'QC', 'QI', 'QR', 'QS', 'QG', 'QH']
-        var_list_number = ['QNC', 'QNI', 'QNR', 'QNS', 'QNG', 'QNH'] 
-        var_list = var_list_mass + var_list_number
-
-        var_list = var_exists(var_list, ds)
-
-        ds_sub = ds[var_list].isel(
-                        height_2=slice(level_range[0],level_range[1]), 
-                        time=slice(0, len(ds.time), 6))
-        df = ds_sub.to_dataframe()
-        df = df.reset_index()
-        
-        # add total hydrometeor amount to the data frame
-        df['total mass'] = 0
-        for var in var_list_mass:
-            df['total mass'] += df[var]
-            
-        df['total number'] = 0
-        for var in var_list_number:
-            df['total number'] += df[var]
-
-        var_list_mass = var_list_mass + ['total mass'] + ['total number']
-        # convert data so that plotting is easier and possible also with log values
-        for varname in var_list_mass:
-            df.loc[df[varname] < 1e-8, varname] = -9
-            df.loc[df[varname] >= 1e-8, varname] = np.log10(df.loc[df[varname] >= 1e-8, varname].values)
-        # the data set must be converted to json so that it is stored as binary to be used in other functions
-        return df.to_json(date_format='iso', orient='split')
+        if ignores_trigger(ctx.triggered_id, date_mode):
+            raise PreventUpdate
+        window = None
+        if ctx.triggered_id == 'hydrometeors_plot':
+            if not changes_time_axis(relayout_data):
+                raise PreventUpdate
+            window = time_window(relayout_data)
+        elif ctx.triggered_id == 'reload-hydrometeors':
+            # the result was evicted from the server side store and is computed again
+            window = result_window(stored)
 
+        # a date range is loaded day by day in parallel and concatenated
+        files = selected_files(config, path, seldate, date_mode, start_date, end_date, window)
+        if not files:
+            return None
+        key = result_key(files, 'hydrometeors', window, lod_config(config))
+        # a reload means that the graph callback did not find the result, possibly in another worker,
+        # so it is stored again even if this worker still holds it
+        if ctx.triggered_id != 'reload-hydrometeors' and has_result(config, key):
+            return result_reference(key, window)
+        # a result computed by another worker process is read from the shared cache
+        grid = shared_result(config, key, lambda: load_files(config, load_hydrometeors, files, window))
+        return store_result(config, key, grid, window)
+
+
+    # with the result in the browser a change of the variable is drawn there, see assets/clientside.js
+    clientside = clientside_figures(config)
 
     @app.callback(Output(component_id='hydrometeors_plot', component_property='figure'),
-                Input('dropdown_hydrometeors', 'value'),
-                Input('intermediate-ds-hydrometeors', 'data'))
-    def hydrometeors_graph_update(dropdown_value, df_json):
-        """ Create hydrometeor plot and update it when the dropdown value changes
+                Output(component_id='live-hydrometeors', component_property='data'),
+                Output(component_id='reload-hydrometeors', component_property='data'),
+                (State if clientside else Input)('dropdown_hydrometeors', 'value'),
+                Input('intermediate-ds-hydrometeors', 'data'),
+                Input('height_slider', 'value'),
+                Input('redraw-hydrometeors', 'data'))
+    def hydrometeors_graph_update(dropdown_value, grid_json, level_range, redraw):
+        """ Create hydrometeor plot and update it when the dropdown value or level range changes
 
         :param dropdown_value: selected dropdown value
-        :param df_json: json data set with hydrometeors
-        :return: updated hydrometeor plot
+        :param grid_json: json data set with hydrometeors or its key in the server side store
+        :param level_range: selected height range
+        :param redraw: set by the clientside callback if it cannot draw the selected variable
+        :return: updated hydrometeor plot, the position of the live mode in it and the request to load the data again
         """
+        if result_missing(config, grid_json):
+            # the data callback computes the evicted result again, the figure is drawn from it then
+            return no_update, no_update, time.time()
+        figure = cached_figure(config, grid_json, build_hydrometeors_figure, dropdown_value, level_range)
+        # the live mode appends the time steps after the end of the shown data
+        return figure, live_position(grid_json, figure), no_update
 
-        df = pd.read_json(StringIO(df_json), orient='split')    
-        
-        # check if the variable is in the dataframe, if not use default error plot
-        if dropdown_value not in df.columns:
-            fig = go.Figure()
-            fig = style_error(fig)
-            return fig
-
-        # create contourplot
-        fig = go.Figure(data=
-                go.Contour(z=df['{}'.format(dropdown_value)], x=df['time'], y=df['height_2'],
-                    colorscale='jet', coloraxis='coloraxis'))
-        
-        # add log scale limits for mass
-        if (dropdown_value != 'QV') & (dropdown_value[1] != 'N') & \
-                (dropdown_value != 'total number'):
-            fig.update_traces(contours=dict(start=-8, end=-2, size=1))
-            
-        # apply styling to the figure
-        fig = style_figure(fig)
-        fig.update_layout(title='',
-                            xaxis_title='Time [UTC]',
-                            yaxis_title='Height [m]'
-                            )
-        
-        # update settings for colorbar
-        if (dropdown_value != 'QV') & (dropdown_value[1] != 'N') & \
-            (dropdown_value != 'total number'):
-            fig.update_layout(
-                coloraxis_colorbar=dict(
-                    title='log10 [kg/kg]',
-                    ),
-                )
-        elif (dropdown_value == 'QV') :
-            fig.update_layout(
-                coloraxis_colorbar=dict(
-                    title='[kg/kg]',
-                    ),
-                )
-        else:
-            fig.update_layout(
-                coloraxis_colorbar=dict(
-                    title='1/kg',
-                    ),
-                )
-            
-        return fig
-
+    if clientside:
+        app.clientside_callback(ClientsideFunction(namespace='dashboard', function_name='hydrometeors_figure'),
+                                Output('hydrometeors_plot', 'figure', allow_duplicate=True),
+                                Output('redraw-hydrometeors', 'data'),
+                                Output('live-hydrometeors', 'data', allow_duplicate=True),
+                                Input('dropdown_hydrometeors', 'value'),
+                                State('intermediate-ds-hydrometeors', 'data'),
+                                State('height_slider', 'value'),
+                                State('variable-meta', 'data'),
+                                State('hydrometeors_plot', 'figure'),
+                                State('live-hydrometeors', 'data'),
+                                prevent_initial_call=True)
@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+from dash import no_update
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+
+from .vars1d_callbacks import load_vars1d
+from .precip_callbacks import load_precip
+from .time_height_callbacks import load_timeheight
+from .hydrometeors_callbacks import load_hydrometeors
+from utils.dataset_cache import meteogram_path
+from utils.live import read_tail, get_live_tails
+from utils.binary import time_ms
+from utils.figure_cache import typed_figures, get_figure_cache
+
+
+def extend_line(grid, names, typed=False):
+    """ extendData of a line plot with one trace per variable
+
+    :param grid: gridded data of the new time steps
+    :param names: variables of the traces in the order of the traces
+    :param typed: the figure was sent with typed arrays, see extend_times
+    :return: extendData for dcc.Graph or no_update if a variable is missing
+    """
+    if grid is None or not all(name in grid['data'] for name in names):
+        return no_update
+    return [{'x': [extend_times(grid['data'][name]['time'], typed) for name in names],
+             'y': [grid['data'][name]['values'] for name in names]}, list(range(len(names)))]
+
+
+def extend_contour(grid, name, level_range, typed=False):
+    """ extendData of a contour plot, z is (time, height) so new time steps are new rows
+
+    :param grid: gridded data of the new time steps
+    :param name: variable shown in the plot
+    :param level_range: selected range of level indices
+    :param typed: the figure was sent with typed arrays, see extend_times
+    :return: extendData for dcc.Graph or no_update if the variable is missing
+    """
+    if grid is None or name not in grid['data']:
+        return no_update
+    levels = slice(level_range[0], level_range[1])
+    return [{'x': [extend_times(grid['time'], typed)], 'z': [grid['data'][name][:, levels]]}, [0]]
+
+
+def extend_times(time, typed):
+    """ Times appended to a trace, as milliseconds if its times are a typed array: plotly.js
+    appends to a typed array in its own type, where a time string would become NaN
+    """
+    return time_ms(time) if typed else time
+
+
+def advance(config, position, grid):
+    """ Keep the new time steps with the result of a graph and move its live position after them
+
+    The steps are added to the result when a figure is built from it, the figures built
+    without them are dropped from the figure cache.
+
+    :param config: app configuration
+    :param position: content of the live store of the graph, see live_position
+    :param grid: gridded data of the new time steps or None
+    :return: the new content of the live store
+    """
+    if grid is None:
+        return position
+    if position['key'] is not None:
+        get_live_tails(config).append(position['key'], position['end'], grid)
+        cache = get_figure_cache(config)
+        if cache is not None:
+            cache.discard(position['key'])
+    return dict(position, end=str(np.datetime_as_string(grid['end'], unit='ns')), appended=True)
+
+
+def get_callbacks_live(app, config):
+    @app.callback(Output(component_id='live_interval', component_property='disabled'),
+                Input(component_id='live_mode', component_property='value'),
+                Input(component_id='date_mode', component_property='value'))
+    def toggle_live(live_mode, date_mode):
+        """ Poll the file of the selected date only when the live mode is switched on
+
+        :param live_mode: value of the live checklist
+        :param date_mode: 'single' or 'range', there is no live mode for a range
+        :return: True if the interval is disabled
+        """
+        return not live_mode or date_mode == 'range'
+
+    @app.callback(Output(component_id='line_plot', component_property='extendData'),
+                Output(component_id='precip_plot', component_property='extendData'),
+                Output(component_id='timeheight_plot', component_property='extendData'),
+                Output(component_id='hydrometeors_plot', component_property='extendData'),
+                Output(component_id='live-vars1d', component_property='data', allow_duplicate=True),
+                Output(component_id='live-precip', component_property='data', allow_duplicate=True),
+                Output(component_id='live-timeheight', component_property='data', allow_duplicate=True),
+                Output(component_id='live-hydrometeors', component_property='data', allow_duplicate=True),
+                Input(component_id='live_interval', component_property='n_intervals'),
+                State(component_id='datepicker', component_property='date'),
+                State(component_id='path', component_property='value'),
+                State(component_id='dropdown_vars1d', component_property='value'),
+                State(component_id='dropdown_timeheight', component_property='value'),
+                State(component_id='dropdown_hydrometeors', component_property='value'),
+                State(component_id='height_slider', component_property='value'),
+                State(component_id='live-vars1d', component_property='data'),
+                State(component_id='live-precip', component_property='data'),
+                State(component_id='live-timeheight', component_property='data'),
+                State(component_id='live-hydrometeors', component_property='data'),
+                prevent_initial_call=True)
+    def live_update(n_intervals, seldate, path, var_vars1d, var_timeheight, var_hydrometeors, level_range,
+                    live_vars1d, live_precip, live_timeheight, live_hydrometeors):
+        """ Append the time steps that were written to the file of the selected date since
+        the graphs were last updated, only the new steps are read and sent
+
+        :param n_intervals: number of polls
+        :param seldate: selected date
+        :param path: path to the data
+        :param var_vars1d: selected 1D variable
+        :param var_timeheight: selected time-height variable
+        :param var_hydrometeors: selected hydrometeor
+        :param level_range: selected height range
+        :param live_vars1d: position of the live mode in the 1D plot, the same for the other plots
+        :return: extendData of the four graphs and their new positions
+        """
+        filename = meteogram_path(config, path, seldate)
+        if not os.path.exists(filename):
+            raise PreventUpdate
+        try:
+            # the plots that show the error figure or a zoomed window have no position and are not extended
+            vars1d = read_tail(config, load_vars1d, filename, live_vars1d['end']) if live_vars1d else None
+            precip = read_tail(config, load_precip, filename, live_precip['end']) if live_precip else None
+            timeheight = read_tail(config, load_timeheight, filename, live_timeheight['end'], two_d=True) \
+                if live_timeheight else None
+            hydrometeors = read_tail(config, load_hydrometeors, filename, live_hydrometeors['end'], two_d=True) \
+                if live_hydrometeors else None
+        except (OSError, RuntimeError):
+            # the file can not be read while the model is writing to it, try again at the next poll
+            raise PreventUpdate
+        if vars1d is None and precip is None and timeheight is None and hydrometeors is None:
+            raise PreventUpdate
+
+        typed = typed_figures(config)
+        return (extend_line(vars1d, [var_vars1d], typed),
+                extend_line(precip, ['PRECIP', 'RAIN', 'SNOW'], typed),
+                extend_contour(timeheight, var_timeheight, level_range, typed),
+                extend_contour(hydrometeors, var_hydrometeors, level_range, typed),
+                advance(config, live_vars1d, vars1d), advance(config, live_precip, precip),
+                advance(config, live_timeheight, timeheight), advance(config, live_hydrometeors, hydrometeors))
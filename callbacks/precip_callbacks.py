@@ -1,61 +1,122 @@
-from dash.dependencies import Input, Output
+import time
+
+from dash import ctx, no_update
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 #from app import app  # import the dash app object
 
-from datetime import datetime
-import xarray as xr
-import pandas as pd
-import plotly.express as px
-import numpy as np
-from io import StringIO
+import plotly.graph_objects as go
 
-from .style_functions import style_figure
+from .style_functions import style_figure, style_error
+from utils.dataset_cache import get_dataset_cache
+from utils.date_range import ignores_trigger, selected_files, load_files
+from utils.result_store import result_key, has_result, store_result, result_reference, result_window, result_missing
+from utils.shared_cache import shared_result
+from utils.figure_cache import cached_figure
+from utils.live import live_position
+from utils.derived_fields import add_precip_fields
+from utils.lod import lod_config, changes_time_axis, time_window, select_window, last_time, minmax_downsample
 
-def get_callbacks_precip(app, config):
-    @app.callback(Output(component_id='intermediate-ds-precip', component_property='data'),
-              Input(component_id='datepicker', component_property='date'),
-              Input(component_id='path', component_property='value'))
-    def get_precip_data(seldate, path):
-        # convert date to YYYYMMDD format
-        seldate = datetime.strptime(seldate, '%Y-%m-%d').strftime('%Y%m%d')
 
-        ds = xr.open_dataset(
-            path+'/'+ config['paths']['prefix_meteogram'] + seldate + config['paths']['postfix_meteogram']+'.nc')
+def load_precip(config, filename, window=None):
+    """ Read snow, rain and total precipitation of a meteogram file
 
-        # Get precipitation as snow, rain and total precip
-        # TODO: Here the error handling is missing, if the variables are not in the dataset
-        ds_sub = ds[['RAIN_GSP', 'RAIN_CON', 'SNOW_GSP', 'SNOW_CON']]
-        ds_sub['SNOW'] = ds_sub.SNOW_GSP + ds_sub.SNOW_CON
-        ds_sub['RAIN'] = ds_sub.RAIN_GSP + ds_sub.RAIN_CON
-        ds_sub['PRECIP'] = ds_sub['SNOW'] + ds_sub['RAIN']
+    :param config: app configuration
+    :param filename: path to the meteogram file
+    :param window: optional time window that is read at full resolution
+    :return: gridded data with a downsampled time series per precipitation type
+    """
+    max_points = lod_config(config)['max_points_1d']
+    ds = get_dataset_cache(config).get(filename)
 
-        # Reformat the data so that plotly can plot it directly
-        ds_flat = ds_sub[['PRECIP', 'RAIN', 'SNOW']].to_array().values.flatten()
-        names_list = np.asarray([['PRECIP'] * len(ds_sub['PRECIP'].values), ['RAIN'] * len(ds_sub['RAIN'].values),
-                                ['SNOW'] * len(ds_sub['SNOW'].values)]).reshape(len(ds_flat))
-        time_vals = np.asarray([ds_sub.time.values, ds_sub.time.values, ds_sub.time.values]).reshape(len(ds_flat))
-        df = pd.DataFrame({'time': time_vals, 'name': names_list, 'values': ds_flat})
+    # Get precipitation as snow, rain and total precip
+    # TODO: Here the error handling is missing, if the variables are not in the dataset
+    # a sidecar already contains the sums, otherwise they are computed here
+    ds_sub = select_window(ds, window)
+    ds_sub = add_precip_fields(ds_sub)
 
-        # The data set must be converted to json so that it is stored as binary to be used in other functions
-        return df.to_json(date_format='iso', orient='split')
+    # Keep one downsampled series per precipitation type, the peaks are preserved
+    data = {}
+    for name in ['PRECIP', 'RAIN', 'SNOW']:
+        time, values = minmax_downsample(ds_sub.time.values, ds_sub[name].values, max_points)
+        data[name] = {'time': time, 'values': values}
+    return {'data': data, 'end': last_time(ds_sub.time.values)}
 
 
-    @app.callback(Output(component_id='precip_plot', component_property='figure'),
-              Input('intermediate-ds-precip', 'data'))
-    def precip_graph_update(df_json):
-        df = pd.read_json(StringIO(df_json), orient='split')
-
-        fig = px.line(df, x='time', y='values', color='name')
-        fig.update_layout(title={
-            'text': 'Select the precipitation type by clicking on the legend',
-            'x': 0.5,
-            'xanchor': 'center',
-            'yanchor': 'top'
-        },
-        xaxis_title='Time',
-        yaxis_title='kg m-2',
-        legend_title='Precip Type'
-        )
-        # apply styling to the figure
-        fig = style_figure(fig)
+def build_precip_figure(grid):
+    """ Create the precipitation line plot
 
+    :param grid: gridded data returned by load_precip
+    :return: plotly figure
+    """
+    if grid is None:
+        fig = go.Figure()
+        fig = style_error(fig)
         return fig
+
+    fig = go.Figure([go.Scatter(x=series['time'], y=series['values'], name=name, mode='lines')
+                     for name, series in grid['data'].items()])
+    fig.update_layout(title={
+        'text': 'Select the precipitation type by clicking on the legend',
+        'x': 0.5,
+        'xanchor': 'center',
+        'yanchor': 'top'
+    },
+    xaxis_title='Time',
+    yaxis_title='kg m-2',
+    legend_title='Precip Type'
+    )
+    # apply styling to the figure
+    fig = style_figure(fig)
+
+    return fig
+
+
+def get_callbacks_precip(app, config):
+    @app.callback(Output(component_id='intermediate-ds-precip', component_property='data'),
+              Input(component_id='datepicker', component_property='date'),
+              Input(component_id='path', component_property='value'),
+              Input(component_id='precip_plot', component_property='relayoutData'),
+              Input(component_id='date_mode', component_property='value'),
+              Input(component_id='daterange', component_property='start_date'),
+              Input(component_id='daterange', component_property='end_date'),
+              Input(component_id='reload-precip', component_property='data'),
+              State(component_id='intermediate-ds-precip', component_property='data'))
+    def get_precip_data(seldate, path, relayout_data, date_mode, start_date, end_date, reload, stored):
+        # a zoom on the time axis fetches the visible window at full resolution
+        if ignores_trigger(ctx.triggered_id, date_mode):
+            raise PreventUpdate
+        window = None
+        if ctx.triggered_id == 'precip_plot':
+            if not changes_time_axis(relayout_data):
+                raise PreventUpdate
+            window = time_window(relayout_data)
+        elif ctx.triggered_id == 'reload-precip':
+            # the result was evicted from the server side store and is computed again
+            window = result_window(stored)
+
+        # a date range is loaded day by day in parallel and concatenated
+        files = selected_files(config, path, seldate, date_mode, start_date, end_date, window)
+        if not files:
+            return None
+        key = result_key(files, 'precip', window, lod_config(config)['max_points_1d'])
+        # a reload means that the graph callback did not find the result, possibly in another worker,
+        # so it is stored again even if this worker still holds it
+        if ctx.triggered_id != 'reload-precip' and has_result(config, key):
+            return result_reference(key, window)
+        # a result computed by another worker process is read from the shared cache
+        grid = shared_result(config, key, lambda: load_files(config, load_precip, files, window))
+        return store_result(config, key, grid, window)
+
+
+    @app.callback(Output(component_id='precip_plot', component_property='figure'),
+              Output(component_id='live-precip', component_property='data'),
+              Output(component_id='reload-precip', component_property='data'),
+              Input('intermediate-ds-precip', 'data'))
+    def precip_graph_update(grid_json):
+        if result_missing(config, grid_json):
+            # the data callback computes the evicted result again, the figure is drawn from it then
+            return no_update, no_update, time.time()
+        figure = cached_figure(config, grid_json, build_precip_figure)
+        # the live mode appends the time steps after the end of the shown data
+        return figure, live_position(grid_json, figure), no_update
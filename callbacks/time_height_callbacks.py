@@ -1,78 +1,166 @@
-import xarray as xr
-import pandas as pd
+import time
+
 import plotly.graph_objects as go
-from dash.dependencies import Input, Output
-from datetime import datetime
-from io import StringIO
+from dash import ctx, no_update
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 
 from .style_functions import style_figure, style_error
-from utils.error_utils import var_exists
+from utils.catalog import available_variables
+from utils.variables import VARS_TIMEHEIGHT, STYLE_TIMEHEIGHT
+from utils.dataset_cache import get_dataset_cache
+from utils.date_range import ignores_trigger, selected_files, load_files
+from utils.result_store import result_key, has_result, store_result, result_reference, result_window, result_missing
+from utils.shared_cache import shared_result
+from utils.figure_cache import cached_figure, clientside_figures
+from utils.climatology import get_climatology
+from utils.live import live_position
+from utils.lod import lod_config, changes_time_axis, time_window, select_window, last_time, decimation_factor, reduce_blocks, block_times
+
+
+def load_timeheight(config, filename, window=None):
+    """ Read the time-height variables of a meteogram file
+
+    :param config: app configuration
+    :param filename: path to the meteogram file
+    :param window: optional time window that is read at full resolution
+    :return: gridded data with time and height_2 axes and a (time, height) array per variable
+    """
+    lod = lod_config(config)
+    ds = get_dataset_cache(config).get(filename)
+
+    var_list = available_variables(config, filename, list(VARS_TIMEHEIGHT))
+
+    # the full column is kept, the level range is applied when the figure is built
+    ds_sub = select_window(ds[var_list], window)
+    # combine time steps in blocks so that each contour stays within the point budget
+    factor = decimation_factor(ds_sub.sizes['time'], ds_sub.sizes['height_2'], lod['max_points_2d'])
+    # keep the (time, height_2) fields as 2-D arrays with 1-D axes instead of a long data frame
+    return {'time': block_times(ds_sub.time.values, factor), 'height_2': ds_sub.height_2.values,
+            'data': {var: reduce_blocks(ds_sub[var].transpose('time', 'height_2'), factor, lod['reduce_2d'])
+                     for var in var_list},
+            'end': last_time(ds_sub.time.values)}
+
+
+def build_timeheight_figure(grid, dropdown_value, level_range, climatology=None):
+    """ Create the time-height contour plot of a variable
+
+    :param grid: gridded data returned by load_timeheight
+    :param dropdown_value: selected variable
+    :param level_range: selected range of level indices
+    :param climatology: optional statistics of the variable at the time steps, see Climatology.at
+    :return: plotly figure
+    """
+    # check if the variable is in the data, if not use default error plot
+    if grid is None or dropdown_value not in grid['data']:
+        fig = go.Figure()
+        fig = style_error(fig)
+        return fig
+
+    # moving the level slider only slices the cached full column instead of reading the file again
+    levels = slice(level_range[0], level_range[1])
+    # colorbar title, colorscale and centre of the variable, shared with the clientside callback
+    style = STYLE_TIMEHEIGHT[dropdown_value]
+    # z is stored as (time, height), transpose lets plotly use it without regridding
+    fig = go.Figure(data=
+                    go.Contour(z=grid['data'][dropdown_value][:, levels], x=grid['time'], y=grid['height_2'][levels],
+                            transpose=True, colorscale=style['colorscale'], colorbar=dict(title=style['colorbar'])))
+    if style['zmid'] is not None:
+        fig.update_traces(zmid=style['zmid'])
+    # the statistics have one column per level of the files, they do not fit other files
+    if climatology is not None and climatology['mean'].shape[1] == len(grid['height_2']):
+        # contour lines of the mean of the month and hour of the day on top of the field,
+        # added after it because the live mode extends the first trace only
+        fig.add_trace(go.Contour(z=climatology['mean'][:, levels], x=grid['time'], y=grid['height_2'][levels],
+                                 transpose=True, contours_coloring='lines', line=dict(color='black', dash='dash'),
+                                 contours_showlabels=True, showscale=False, hoverinfo='skip'))
+
+    # apply styling to the figure
+    fig = style_figure(fig)
+
+    fig.update_layout(title='',
+                    xaxis_title='Time [UTC]',
+                    yaxis_title='Height [m]')
+
+    return fig
+
 
 def get_callbacks_timeheight(app, config):
 
     @app.callback(Output(component_id='intermediate-ds-timeheight', component_property='data'),
                 Input(component_id='datepicker', component_property='date'),
                 Input(component_id='path', component_property='value'),
-                Input(component_id='height_slider', component_property='value'))
-    def get_timeheight_data(seldate, path, level_range):
-        # convert date to YYYYMMDD format
-        seldate = datetime.strptime(seldate, '%Y-%m-%d').strftime('%Y%m%d')
+                Input(component_id='timeheight_plot', component_property='relayoutData'),
+                Input(component_id='date_mode', component_property='value'),
+                Input(component_id='daterange', component_property='start_date'),
+                Input(component_id='daterange', component_property='end_date'),
+                Input(component_id='reload-timeheight', component_property='data'),
+                State(component_id='intermediate-ds-timeheight', component_property='data'))
+    def get_timeheight_data(seldate, path, relayout_data, date_mode, start_date, end_date, reload, stored):
+        # a zoom on the time axis fetches the visible window at full resolution
+        if ignores_trigger(ctx.triggered_id, date_mode):
+            raise PreventUpdate
+        window = None
+        if ctx.triggered_id == 'timeheight_plot':
+            if not changes_time_axis(relayout_data):
+                raise PreventUpdate
+            window = time_window(relayout_data)
+        elif ctx.triggered_id == 'reload-timeheight':
+            # the result was evicted from the server side store and is computed again
+            window = result_window(stored)
 
-        ds = xr.open_dataset(
-            path+'/'+ config['paths']['prefix_meteogram'] + seldate + config['paths']['postfix_meteogram']+'.nc')
-        # only get up to around 12 km height and every 6th time step to reduce data size for speedup
+        # a date range is loaded day by day in parallel and concatenated
+        files = selected_files(config, path, seldate, date_mode, start_date, end_date, window)
+        if not files:
+            return None
+        key = result_key(files, 'timeheight', window, lod_config(config))
+        # a reload means that the graph callback did not find the result, possibly in another worker,
+        # so it is stored again even if this worker still holds it
+        if ctx.triggered_id != 'reload-timeheight' and has_result(config, key):
+            return result_reference(key, window)
+        # a result computed by another worker process is read from the shared cache
+        grid = shared_result(config, key, lambda: load_files(config, load_timeheight, files, window))
+        return store_result(config, key, grid, window)
 
-        var_list = ['CLC', 'T', 'RHO', 'P', 'REL_HUM','U', 'V']
-        var_list = var_exists(var_list, ds)
 
-        ds_sub = ds[var_list].isel(height_2=slice(level_range[0], level_range[1]), time=slice(0, len(ds.time), 6))
-        df = ds_sub.to_dataframe()
-        df = df.reset_index()
-        # timeheighte data set must be converted to json so timeheightat it is stored as binary to be used in otimeheighter functions
-        return df.to_json(date_format='iso', orient='split')
+    # with the result in the browser a change of the variable is drawn there, see assets/clientside.js
+    clientside = clientside_figures(config)
 
+    def build_figure(grid, dropdown_value, level_range, overlay, version):
+        climatology = None
+        if overlay and grid is not None and dropdown_value in grid['data']:
+            climatology = get_climatology(config).at(dropdown_value, grid['time'])
+        return build_timeheight_figure(grid, dropdown_value, level_range, climatology)
 
     @app.callback(Output(component_id='timeheight_plot', component_property='figure'),
-                Input('dropdown_timeheight', 'value'),
-                Input('intermediate-ds-timeheight', 'data'))
-    def timeheight_graph_update(dropdown_value, df_json):
-        df = pd.read_json(StringIO(df_json), orient='split')
-
-        # check if the variable is in the dataframe, if not use default error plot
-        if dropdown_value not in df.columns:
-            fig = go.Figure()
-            fig = style_error(fig)
-            return fig
-        
-        fig = go.Figure(data=
-                        go.Contour(z=df['{}'.format(dropdown_value)], x=df['time'], y=df['height_2'],
-                                colorscale='viridis_r', colorbar=dict(title='')))
-        
-        # apply styling to the figure
-        fig = style_figure(fig)
-
-        fig.update_layout(title='',
-                        xaxis_title='Time [UTC]',
-                        yaxis_title='Height [m]')
-        # loop over all possible variables and set the colorbar title accordingly
-        dropdown_values = ['CLC', 'T', 'RHO', 'P', 'REL_HUM',
-                           'U', 'V']
-        cbar_titles = ['0 or 1', 'T [K]', 'Rho [kg/m^3]', 'P [Pa]',
-                       ' Rel. hum. [%]', 'U [m/s]', 'V [m/s]']
-        for dv, ct in zip(dropdown_values, cbar_titles):
-            if dropdown_value == dv:
-                fig.update_traces(
-                    colorbar=dict(
-                        title=ct,
-                        ),
-                )
-        if dropdown_value == 'T':
-            #update colorscale for temperature
-            fig.update_traces(colorscale="Turbo", selector=dict(type='contour'))
-        if dropdown_value in ['U', 'V']:
-            #update colorscale for wind, center around 0
-            fig.update_traces(colorscale="PRGn", selector=dict(type='contour'),
-                              zmid=0)
-        
-        return fig
+                Output(component_id='live-timeheight', component_property='data'),
+                Output(component_id='reload-timeheight', component_property='data'),
+                (State if clientside else Input)('dropdown_timeheight', 'value'),
+                Input('intermediate-ds-timeheight', 'data'),
+                Input('height_slider', 'value'),
+                Input('climatology', 'value'),
+                Input('redraw-timeheight', 'data'))
+    def timeheight_graph_update(dropdown_value, grid_json, level_range, climatology, redraw):
+        if result_missing(config, grid_json):
+            # the data callback computes the evicted result again, the figure is drawn from it then
+            return no_update, no_update, time.time()
+        # the version of the statistics is part of the key, an update of them draws the overlay again
+        overlay = 'overlay' in (climatology or [])
+        version = get_climatology(config).version if overlay else None
+        figure = cached_figure(config, grid_json, build_figure, dropdown_value, level_range, overlay, version)
+        # the live mode appends the time steps after the end of the shown data
+        return figure, live_position(grid_json, figure), no_update
 
+    if clientside:
+        app.clientside_callback(ClientsideFunction(namespace='dashboard', function_name='timeheight_figure'),
+                                Output('timeheight_plot', 'figure', allow_duplicate=True),
+                                Output('redraw-timeheight', 'data'),
+                                Output('live-timeheight', 'data', allow_duplicate=True),
+                                Input('dropdown_timeheight', 'value'),
+                                State('intermediate-ds-timeheight', 'data'),
+                                State('height_slider', 'value'),
+                                State('climatology', 'value'),
+                                State('variable-meta', 'data'),
+                                State('timeheight_plot', 'figure'),
+                                State('live-timeheight', 'data'),
+                                prevent_initial_call=True)
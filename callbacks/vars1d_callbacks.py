@@ -1,67 +1,177 @@
-from dash.dependencies import Input, Output
+import time
+
+from dash import ctx, no_update
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 #from app import app  # import the dash app object
 
-from datetime import datetime
-import xarray as xr
-import pandas as pd
 import plotly.graph_objects as go
-from io import StringIO
 
 from .style_functions import style_figure, style_error
-from utils.error_utils import var_exists
+from utils.catalog import available_variables
+from utils.variables import VARS_1D, STYLE_1D
+from utils.dataset_cache import get_dataset_cache
+from utils.date_range import ignores_trigger, selected_files, load_files
+from utils.result_store import result_key, has_result, store_result, result_reference, result_window, result_missing
+from utils.shared_cache import shared_result
+from utils.figure_cache import cached_figure, clientside_figures
+from utils.climatology import get_climatology
+from utils.live import live_position
+from utils.prefetch import get_prefetcher
+from utils.lod import lod_config, changes_time_axis, time_window, select_window, last_time, minmax_downsample
+
+
+def load_vars1d(config, filename, window=None):
+    """ Read the 1D variables of a meteogram file
+
+    :param config: app configuration
+    :param filename: path to the meteogram file
+    :param window: optional time window that is read at full resolution
+    :return: gridded data with a downsampled time series per variable
+    """
+    max_points = lod_config(config)['max_points_1d']
+    ds = get_dataset_cache(config).get(filename)
+
+    var_list = available_variables(config, filename, list(VARS_1D))
+
+    ds_sub1d = select_window(ds[var_list], window)
+    # every series is downsampled on its own so that its minima and maxima are kept
+    data = {}
+    for var in var_list:
+        time, values = minmax_downsample(ds_sub1d.time.values, ds_sub1d[var].values, max_points)
+        data[var] = {'time': time, 'values': values}
+    return {'data': data, 'end': last_time(ds_sub1d.time.values)}
+
+
+def build_vars1d_figure(grid, dropdown_value, climatology=None):
+    """ Create the line plot of a 1D variable
+
+    :param grid: gridded data returned by load_vars1d
+    :param dropdown_value: selected variable
+    :param climatology: optional statistics of the variable at the time steps, see Climatology.at
+    :return: plotly figure
+    """
+    # check if the variable is in the data, if not use default error plot
+    if grid is None or dropdown_value not in grid['data']:
+        fig = go.Figure()
+        fig = style_error(fig)
+        return fig
+
+    series = grid['data'][dropdown_value]
+    fig = go.Figure([go.Scatter(x=series['time'], y=series['values'],
+        line=dict(color='firebrick', width=3))
+        ])
+    if climatology is not None:
+        add_climatology_band(fig, series['time'], climatology)
+    # apply styling to the figure
+    fig = style_figure(fig)
+
+    if dropdown_value in STYLE_1D:
+        title = STYLE_1D[dropdown_value]
+        fig.update_layout(
+        xaxis_title='Time',
+        yaxis_title=title['yaxis_title'],
+        margin=dict(l=20, r=20, t=20, b=10),  # set the margin values
+        height=380  # set the figure height to 300 pixels
+        )
+    return fig
+
+
+def add_climatology_band(fig, time, climatology):
+    """ Add the 10th to 90th percentile and the mean of the month and hour of the day
+
+    The traces are added after the data, the live mode extends the first trace only.
+
+    :param fig: line plot of a 1D variable
+    :param time: time steps of the line
+    :param climatology: statistics of the variable at the time steps, see Climatology.at
+    """
+    band = dict(x=time, mode='lines', line=dict(width=0), hoverinfo='skip', showlegend=False)
+    fig.add_trace(go.Scatter(y=climatology[10][:, 0], **band))
+    fig.add_trace(go.Scatter(y=climatology[90][:, 0], fill='tonexty', fillcolor='rgba(0,81,118,0.2)', **band))
+    fig.add_trace(go.Scatter(x=time, y=climatology['mean'][:, 0], name='climatology',
+                             line=dict(color='#005176', width=2, dash='dash'), showlegend=False))
+
 
 # This wrapping function is to avoid circular imports
 def get_callbacks_vars1d(app, config):
     @app.callback(Output(component_id='intermediate-ds-vars1d', component_property='data'),
                 Input(component_id='datepicker', component_property='date'),
-                Input(component_id='path', component_property='value'))
-    def get_data(seldate, path):
-        # convert date to YYYYMMDD format
-        seldate = datetime.strptime(seldate, '%Y-%m-%d').strftime('%Y%m%d')
-        
-        ds = xr.open_dataset(
-            path+'/'+ config['paths']['prefix_meteogram'] + seldate + config['paths']['postfix_meteogram']+'.nc')
-        
-        var_list = ['T2M', 'P_SFC', 'TQV', 'TQC', 'TQI']
-        var_list = var_exists(var_list, ds)
-
-        ds_sub1d = ds[var_list]
-        df = ds_sub1d.to_dataframe()
-        df = df.reset_index(col_fill='time')
-        # The data set must be converted to json so that it is stored as binary to be used in other functions
-        return df.to_json(date_format='iso', orient='split')
+                Input(component_id='path', component_property='value'),
+                Input(component_id='line_plot', component_property='relayoutData'),
+                Input(component_id='date_mode', component_property='value'),
+                Input(component_id='daterange', component_property='start_date'),
+                Input(component_id='daterange', component_property='end_date'),
+                Input(component_id='reload-vars1d', component_property='data'),
+                State(component_id='intermediate-ds-vars1d', component_property='data'))
+    def get_data(seldate, path, relayout_data, date_mode, start_date, end_date, reload, stored):
+        # a zoom on the time axis fetches the visible window at full resolution,
+        # any other change of the date or path shows the entire day again
+        if ignores_trigger(ctx.triggered_id, date_mode):
+            raise PreventUpdate
+        window = None
+        if ctx.triggered_id == 'line_plot':
+            if not changes_time_axis(relayout_data):
+                raise PreventUpdate
+            window = time_window(relayout_data)
+        elif ctx.triggered_id == 'reload-vars1d':
+            # the result was evicted from the server side store and is computed again
+            window = result_window(stored)
+
+        # warm the cache for the neighbouring days while the user looks at this one,
+        # this is done once per date change for all panels, not for a zoom or a reload
+        if date_mode != 'range' and ctx.triggered_id in (None, 'datepicker', 'path', 'date_mode'):
+            get_prefetcher(config).schedule(path, seldate)
+
+        # a date range is loaded day by day in parallel and concatenated
+        files = selected_files(config, path, seldate, date_mode, start_date, end_date, window)
+        if not files:
+            return None
+        key = result_key(files, 'vars1d', window, lod_config(config)['max_points_1d'])
+        # a reload means that the graph callback did not find the result, possibly in another worker,
+        # so it is stored again even if this worker still holds it
+        if ctx.triggered_id != 'reload-vars1d' and has_result(config, key):
+            return result_reference(key, window)
+        # a result computed by another worker process is read from the shared cache
+        grid = shared_result(config, key, lambda: load_files(config, load_vars1d, files, window))
+        return store_result(config, key, grid, window)
+
+    # with the result in the browser a change of the variable is drawn there, see assets/clientside.js
+    clientside = clientside_figures(config)
+
+    def build_figure(grid, dropdown_value, overlay, version):
+        climatology = None
+        if overlay and grid is not None and dropdown_value in grid['data']:
+            climatology = get_climatology(config).at(dropdown_value, grid['data'][dropdown_value]['time'])
+        return build_vars1d_figure(grid, dropdown_value, climatology)
 
     @app.callback(Output(component_id='line_plot', component_property='figure'),
-                Input(component_id='dropdown_vars1d', component_property='value'),
-                Input('intermediate-ds-vars1d', 'data'))
-    def graph_update_vars1d(dropdown_value, df_json):
-        df = pd.read_json(StringIO(df_json), orient='split')
-
-        # check if the variable is in the dataframe, if not use default error plot
-        if dropdown_value not in df.columns:
-            fig = go.Figure()
-            fig = style_error(fig)
-            return fig
-        
-        fig = go.Figure([go.Scatter(x=df['time'], y=df['{}'.format(dropdown_value)],
-            line=dict(color='firebrick', width=3))
-            ])
-        # apply styling to the figure
-        fig = style_figure(fig)
-
-        titles = {
-            'T2M': {'yaxis_title': 'K'},
-            'P_SFC': {'yaxis_title': 'hPa'},
-            'TQV': {'yaxis_title': 'kg m-2'},
-            'TQC': {'yaxis_title': 'kg m-2'},
-            'TQI': {'yaxis_title': 'kg m-2'}
-        }
-        if dropdown_value in titles:
-            title = titles[dropdown_value]
-            fig.update_layout(
-            xaxis_title='Time',
-            yaxis_title=title['yaxis_title'],
-            margin=dict(l=20, r=20, t=20, b=10),  # set the margin values
-            height=380  # set the figure height to 300 pixels
-            )
-        return fig
+                Output(component_id='live-vars1d', component_property='data'),
+                Output(component_id='reload-vars1d', component_property='data'),
+                (State if clientside else Input)(component_id='dropdown_vars1d', component_property='value'),
+                Input('intermediate-ds-vars1d', 'data'),
+                Input('climatology', 'value'),
+                Input('redraw-vars1d', 'data'))
+    def graph_update_vars1d(dropdown_value, grid_json, climatology, redraw):
+        if result_missing(config, grid_json):
+            # the data callback computes the evicted result again, the figure is drawn from it then
+            return no_update, no_update, time.time()
+        # the version of the statistics is part of the key, an update of them draws the overlay again
+        overlay = 'overlay' in (climatology or [])
+        version = get_climatology(config).version if overlay else None
+        figure = cached_figure(config, grid_json, build_figure, dropdown_value, overlay, version)
+        # the live mode appends the time steps after the end of the shown data
+        return figure, live_position(grid_json, figure), no_update
+
+    if clientside:
+        app.clientside_callback(ClientsideFunction(namespace='dashboard', function_name='vars1d_figure'),
+                                Output('line_plot', 'figure', allow_duplicate=True),
+                                Output('redraw-vars1d', 'data'),
+                                Output('live-vars1d', 'data', allow_duplicate=True),
+                                Input('dropdown_vars1d', 'value'),
+                                State('intermediate-ds-vars1d', 'data'),
+                                State('climatology', 'value'),
+                                State('variable-meta', 'data'),
+                                State('line_plot', 'figure'),
+                                State('live-vars1d', 'data'),
+                                prevent_initial_call=True)
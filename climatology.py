@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+""" Compute the statistics of every calendar month that the dashboard overlays on its graphs
+
+Usage: python climatology.py [--config assets/config.toml] [--path /path/to/data] [--workers 4] [--force]
+"""
+
+import argparse
+
+from utils.config_utils import load_config
+from utils.climatology import stats_config, update_statistics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update the climatology of the meteogram files of the dashboard.')
+    parser.add_argument('--config', default='./assets/config.toml', help='path to the configuration file')
+    parser.add_argument('--path', help='directory with the meteogram files, defaults to paths.data')
+    parser.add_argument('--workers', type=int, help='number of parallel processes, defaults to [stats] workers')
+    parser.add_argument('--force', action='store_true', help='compute the statistics of all days again')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    path = args.path or config['paths']['data']
+    print('Updating the statistics in {} with the days in {}'.format(stats_config(config)['directory'], path))
+    result = update_statistics(config, path, workers=args.workers, rebuild=args.force)
+    print('{} days added, {} months computed again'.format(result['added'], result['rebuilt']))
+
+
+if __name__ == '__main__':
+    main()
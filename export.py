@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+""" Write quicklooks of every panel of the dashboard for the days in the data directory
+
+Usage: python export.py [--config assets/config.toml] [--path /path/to/data] [--start 2021-09-01]
+                        [--end 2021-09-30] [--output ./quicklooks] [--format png html] [--workers 4] [--force]
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.config_utils import load_config
+from utils.dataset_cache import list_meteogram_files
+from utils.export import check_formats, export_config, export_day
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the figures of the dashboard for a range of days.')
+    parser.add_argument('--config', default='./assets/config.toml', help='path to the configuration file')
+    parser.add_argument('--path', help='directory with the meteogram files, defaults to paths.data')
+    parser.add_argument('--start', help='first date as YYYY-MM-DD, defaults to the first file')
+    parser.add_argument('--end', help='last date as YYYY-MM-DD, defaults to the last file')
+    parser.add_argument('--output', help='output directory, defaults to [export] directory')
+    parser.add_argument('--format', nargs='+', choices=['png', 'svg', 'pdf', 'html'],
+                        help='output formats, defaults to [export] formats; images require kaleido')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of parallel processes')
+    parser.add_argument('--force', action='store_true', help='export days that are up to date')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    # the command line overrides the [export] table, the workers read the settings from the config
+    export = dict(config.get('export', {}))
+    if args.output:
+        export['directory'] = args.output
+    if args.format:
+        export['formats'] = args.format
+    config = dict(config, export=export)
+    settings = export_config(config)
+    try:
+        check_formats(settings['formats'])
+    except ValueError as err:
+        parser.error(str(err))
+
+    path = args.path or config['paths']['data']
+    files = {seldate: filename for seldate, filename in list_meteogram_files(config, path).items()
+             if (not args.start or seldate >= args.start) and (not args.end or seldate <= args.end)}
+    print('Found {} meteogram files in {}, writing {} to {}'.format(
+        len(files), path, ', '.join(settings['formats']), settings['directory']))
+
+    written = skipped = failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(export_day, config, filename, seldate, args.force): seldate
+                   for seldate, filename in files.items()}
+        for future in as_completed(futures):
+            try:
+                if future.result():
+                    written += 1
+                    print('written  ' + futures[future])
+                else:
+                    skipped += 1
+            except Exception as err:
+                failed += 1
+                print('failed   {}: {}'.format(futures[future], err))
+    print('{} written, {} up to date, {} failed'.format(written, skipped, failed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+""" gunicorn settings of the dashboard, read from the [server] table of the configuration
+
+    gunicorn -c gunicorn.conf.py
+"""
+
+import os
+
+from utils.config_utils import load_config, server_config
+
+_settings = server_config(load_config(os.environ.get('DASHBOARD_CONFIG', './assets/config.toml')))
+
+wsgi_app = 'wsgi:server'
+bind = '{}:{}'.format(_settings['host'], _settings['port'])
+workers = _settings['workers']
+# more than one thread per worker selects the gthread worker class
+threads = _settings['threads']
+timeout = _settings['timeout']
+# every worker builds its own app after the fork, the thread and process pools of the
+# caches must not be shared between workers
+preload_app = False
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+""" Convert the meteogram files in the data directory to sidecars that are faster to read
+
+Usage: python ingest.py [--config assets/config.toml] [--path /path/to/data] [--workers 4] [--force]
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.config_utils import load_config
+from utils.dataset_cache import list_meteogram_files
+from utils.sidecar import build_sidecar, sidecar_config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build sidecars for the meteogram files of the dashboard.')
+    parser.add_argument('--config', default='./assets/config.toml', help='path to the configuration file')
+    parser.add_argument('--path', help='directory with the meteogram files, defaults to paths.data')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of parallel processes')
+    parser.add_argument('--force', action='store_true', help='rebuild sidecars that are up to date')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    path = args.path or config['paths']['data']
+    files = list_meteogram_files(config, path)
+    print('Found {} meteogram files in {}, writing {} sidecars'.format(
+        len(files), path, sidecar_config(config)['format']))
+
+    written = skipped = failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(build_sidecar, config, filename, args.force): filename
+                   for filename in files.values()}
+        for future in as_completed(futures):
+            try:
+                if future.result():
+                    written += 1
+                    print('written  ' + futures[future])
+                else:
+                    skipped += 1
+            except Exception as err:
+                failed += 1
+                print('failed   {}: {}'.format(futures[future], err))
+    print('{} written, {} up to date, {} failed'.format(written, skipped, failed))
+
+
+if __name__ == '__main__':
+    main()
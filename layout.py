@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+""" Layout of the dashboard, built without reading any data so that a worker serves the page at once """
+
+from datetime import date, datetime
+
+from dash import dcc
+from dash import html
+
+from utils.variables import VARS_1D, VARS_TIMEHEIGHT, VARS_HYDROMETEORS, dropdown_options, variable_meta
+from utils.live import live_config
+
+
+def serve_layout(config : dict) -> html.Div:
+    """ Build the layout of the dashboard, called for every page load
+
+    :param config: app configuration
+    :return: root component of the page
+    """
+    bg_color = config['style']['bg_color'] # color for the background of entire page
+    divider_color = config['style']['divider_color'] # dividers between rows
+    text_color = config['style']['text_color']    # text color for the entire page
+
+    # Here we define the layout of the app
+    return html.Div(id='parent', children=[
+    
+        # make a coloredbanner with a title
+        html.Div(children=[
+            html.H1(id='H1', children='ICON Cologne Dashboard')
+                ], style={'background-color': '#005176', 'color': 'white', 'padding': '10px'}
+            ),
+
+        # thin bar with specified color
+        html.Div(style={'height': '5px', 'background-color': divider_color}),
+        html.Div(children=[
+            html.P("Select a date: "),
+            dcc.RadioItems(id='date_mode',
+                           options=[{'label': 'Single day', 'value': 'single'},
+                                    {'label': 'Date range', 'value': 'range'}],
+                           value='single', inline=True,
+                           inputStyle={'margin-left': '10px', 'margin-right': '5px'}),
+            html.Div(id='datepicker_div', children=[
+                dcc.DatePickerSingle(id='datepicker',
+                                     date=date(2021, 9, 9),
+                                     display_format='YYYY-MM-DD',
+                                     max_date_allowed=datetime.today(), 
+                                     style={'margin-left': '10px'}),
+                ]),
+            # several days are shown together, longer ranges are cut to [range] max_days
+            html.Div(id='daterange_div', children=[
+                dcc.DatePickerRange(id='daterange',
+                                    start_date=date(2021, 9, 9),
+                                    end_date=date(2021, 9, 9),
+                                    display_format='YYYY-MM-DD',
+                                    max_date_allowed=datetime.today(),
+                                    minimum_nights=0,
+                                    style={'margin-left': '10px'}),
+                ], style={'display': 'none'}),
+            # append the time steps of a file that is still being written
+            dcc.Checklist(id='live_mode', options=[{'label': 'Live', 'value': 'live'}], value=[],
+                          inputStyle={'margin-left': '10px', 'margin-right': '5px'}),
+            # mean and percentiles of the month and hour of the day, computed by climatology.py
+            dcc.Checklist(id='climatology', options=[{'label': 'Climatology', 'value': 'overlay'}], value=[],
+                          inputStyle={'margin-left': '10px', 'margin-right': '5px'}),
+            dcc.Interval(id='live_interval', interval=live_config(config)['interval_seconds'] * 1000,
+                         disabled=True),
+            html.P("Select level range: "),
+            html.Div(children=[
+                dcc.RangeSlider(id='height_slider', min=30, max=config['data.meteogram']['maxlev_idx'], 
+                            step=1, value=[50,config['data.meteogram']['maxlev_idx']],
+                            marks=None,
+                            tooltip={
+                                    "placement": "bottom",
+                                    "always_visible": True,
+                                    },
+                        ),
+                ], style={'width': '50%', 'margin-left': '10px'}),
+                              # marks={[i: ' {}'.format(i) for i in range(30, 121, 10)]}),
+            html.P("Path to data: ", style={'margin-left': '20px'}),
+            # for development only use the path to the data on the server
+            dcc.Input(id='path', type='text', value=config['paths']['data'],
+                       style={'width': '20%', 'margin-left': '10px'}),
+        ], style={'text-align': 'left', 'padding': '10px',
+                'background-color': '#0077a1', 'color': text_color, 'padding': '10px'}),
+        # thin bar with specified color
+        html.Div(style={'height': '5px', 'background-color': divider_color}),
+
+        # first row separated into 2 columns
+        html.Div(children=[
+            # dropdown menu for 1d variables
+            html.Div(children=[
+                html.H3("1D Variables"),
+                html.P("Select variable: "),
+                dcc.Dropdown(id='dropdown_vars1d',
+                        options=dropdown_options(VARS_1D),
+                        value='T2M', style={ 'color': '#0077a1'}),
+                # add a button to select if logarithmic scale should be used
+                dcc.Graph(id='line_plot')            
+                ], style={'width': '45%', 'display': 'inline-block', 'margin-right': '2%',
+                          'vertical-align': 'top', 'margin-left': '2%'}
+                          # the margin creates a gap between the two columns
+                          # the vertical-align aligns the bottom of the plot with the bottom of the div
+            ),
+            # second column plot
+            html.Div(children=[
+                html.H3("Precipitation"),
+                dcc.Graph(id='precip_plot')],
+                style={'width': '45%', 'display': 'inline-block',  'margin-left': '2%',
+                      'vertical-align': 'top', 'margin-right': '1%'}
+            ),
+        ], style={'color': text_color}),
+
+        # three round dots in the center of the page
+        html.Div(children=[
+            html.H1("☁ ☀ ❄ ☂ ☁ "),
+        ], style={'text-align': 'center', 'padding': '10px', 'color': divider_color, 'letter-spacing': '20px'}),
+
+        html.Div(children=[
+            html.Div(children=[
+                html.H3("Time-height variables"),
+                html.P("Select variable: "),
+                dcc.Dropdown(id='dropdown_timeheight',
+                            options=dropdown_options(VARS_TIMEHEIGHT),
+                            value='CLC', style={ 'color': '#0077a1'}),
+            dcc.Graph(id='timeheight_plot'),
+            ], style={'width': '45%', 'display': 'inline-block', 'margin-right': '2%',
+                      'vertical-align': 'top', 'margin-left': '2%'
+                      }),
+
+            html.Div(children=[
+                html.H3("Hydrometeors"),
+                html.P("Select variable: "),
+                dcc.Dropdown(id='dropdown_hydrometeors',
+                            options=dropdown_options(VARS_HYDROMETEORS),
+                            value='QV', style={ 'color': '#0077a1'}),
+                dcc.Graph(id='hydrometeors_plot')
+            ], style={'width': '45%', 'display': 'inline-block',  'margin-left': '2%',
+                       'vertical-align': 'top'}
+            ),
+        ]),
+    
+        # dcc.Store inside the app that stores the intermediate value
+        dcc.Store(id='intermediate-ds-vars1d'),
+        dcc.Store(id='intermediate-ds-precip'),
+        dcc.Store(id='intermediate-ds-timeheight'),
+        dcc.Store(id='intermediate-ds-hydrometeors'),
+        # last time step shown in each graph, the live mode appends the steps after it
+        dcc.Store(id='live-vars1d'),
+        dcc.Store(id='live-precip'),
+        dcc.Store(id='live-timeheight'),
+        dcc.Store(id='live-hydrometeors'),
+        # styles of the variables for the graphs redrawn in the browser, and the requests
+        # to draw a graph on the server if it cannot be redrawn there
+        dcc.Store(id='variable-meta', data=variable_meta()),
+        dcc.Store(id='redraw-vars1d'),
+        dcc.Store(id='redraw-timeheight'),
+        dcc.Store(id='redraw-hydrometeors'),
+        # requests to compute a result again that was evicted from the server side store
+        dcc.Store(id='reload-vars1d'),
+        dcc.Store(id='reload-precip'),
+        dcc.Store(id='reload-timeheight'),
+        dcc.Store(id='reload-hydrometeors')
+    ], style={'font-family': 'system-ui', 'background-color': bg_color, 'color': text_color})
@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+
+from utils.binary import encode_array, decode_array, encode_binary, decode_binary, typed_figure, time_ms
+
+
+def test_times_round_trip_through_base64():
+    time = np.array(['2021-09-09T00:00:09', 'NaT', '2021-09-09T23:59:59.123'], dtype='datetime64[ns]')
+    encoded = encode_array(time)
+
+    assert encoded['dtype'] == 'f8' and encoded['time']
+    np.testing.assert_array_equal(decode_array(encoded), time)
+
+
+def test_values_round_trip_in_the_chosen_dtype():
+    values = np.array([[1.5, np.nan, -2], [3, 4, 5]])
+    encoded = encode_array(values, 'float32')
+
+    assert encoded['dtype'] == 'f4'
+    assert [int(size) for size in encoded['shape'].split(',')] == [2, 3]
+    np.testing.assert_array_equal(decode_array(encoded), values)
+
+
+def test_grid_round_trip_through_json():
+    grid = {'time': np.array(['2021-09-09T00:00', '2021-09-09T00:10'], dtype='datetime64[ns]'),
+            'height_2': np.array([100., 50.]),
+            'data': {'T': np.array([[280., 281.], [282., np.nan]])},
+            'end': np.asarray(np.datetime64('2021-09-09T00:10', 'ns'))}
+    decoded = decode_binary(json.loads(json.dumps(encode_binary(grid, 'float64'))))
+
+    np.testing.assert_array_equal(decoded['time'], grid['time'])
+    np.testing.assert_array_equal(decoded['data']['T'], grid['data']['T'])
+    assert decoded['end'] == grid['end']
+
+
+def test_typed_figure_sets_date_axes():
+    time = np.array(['2021-09-09T00:00', '2021-09-09T00:10'], dtype='datetime64[ns]')
+    figure = typed_figure({'data': [{'type': 'scatter', 'x': time, 'y': np.array([1., 2.])}]})
+
+    assert figure['layout']['xaxis']['type'] == 'date'
+    np.testing.assert_array_equal(decode_array(figure['data'][0]['x']), time)
+    np.testing.assert_array_equal(time_ms(time), [1631145600000., 1631146200000.])
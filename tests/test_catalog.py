@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from utils.catalog import Catalog
+
+CONFIG = {'paths': {'prefix_meteogram': 'METEOGRAM_patch001_', 'postfix_meteogram': '_koeln'}}
+
+
+def write_day(path, date):
+    filename = path / 'METEOGRAM_patch001_{}_koeln.nc'.format(date.replace('-', ''))
+    time = pd.date_range(date, periods=6, freq='10min')
+    xr.Dataset({'T2M': ('time', np.arange(6.))}, coords={'time': time}).to_netcdf(filename)
+    return filename
+
+
+def test_unreadable_file_is_left_out_until_it_can_be_read(tmp_path):
+    write_day(tmp_path, '2021-09-08')
+    good = write_day(tmp_path, '2021-09-10').read_bytes()
+    # a file that is still being written
+    broken = tmp_path / 'METEOGRAM_patch001_20210909_koeln.nc'
+    broken.write_bytes(good[:len(good) // 3])
+
+    catalog = Catalog(CONFIG, str(tmp_path))
+    assert list(catalog.files()) == ['2021-09-08', '2021-09-10']
+    assert catalog.disabled_days() == ['2021-09-09']
+    assert catalog.entry(str(broken)) is None
+
+    write_day(tmp_path, '2021-09-09')
+    catalog.refresh(force=True)
+    assert list(catalog.files()) == ['2021-09-08', '2021-09-09', '2021-09-10']
+    assert catalog.entry(str(broken))['variables'] == ['T2M']
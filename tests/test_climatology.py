@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from utils.climatology import (day_sketch, merge_sketches, outside_fraction, sketch_percentiles,
+                               update_statistics, value_range, Climatology)
+
+BINS = 64
+
+
+def day(seed, n_time=144, n_levels=3, offset=0.):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(offset, 1, (n_time, n_levels))
+    values[5, 1] = np.nan
+    hours = np.arange(n_time) * 24 // n_time
+    return values, hours
+
+
+def test_merged_sketches_equal_a_single_pass():
+    (a, hours_a), (b, hours_b) = day(0), day(1, offset=0.5)
+    lo, span = value_range(a, 0.5)
+    merged = merge_sketches(day_sketch(a, hours_a, lo, span, BINS), day_sketch(b, hours_b, lo, span, BINS))
+    single = day_sketch(np.concatenate([a, b]), np.concatenate([hours_a, hours_b]), lo, span, BINS)
+
+    for name in ('n', 'hist', 'outside', 'min', 'max'):
+        np.testing.assert_array_equal(merged[name], single[name])
+    np.testing.assert_allclose(merged['mean'], single['mean'])
+    np.testing.assert_allclose(merged['m2'], single['m2'])
+
+
+def test_percentiles_are_within_a_bin():
+    values, hours = day(2, n_time=24 * 500, n_levels=2)
+    lo, span = value_range(values, 0.5)
+    percentiles = sketch_percentiles(day_sketch(values, hours, lo, span, BINS), [10, 50, 90])
+
+    for percentile, estimate in percentiles.items():
+        exact = np.stack([np.nanpercentile(values[hours == hour], percentile, axis=0) for hour in range(24)])
+        assert np.all(np.abs(estimate - exact) <= span / BINS)
+
+
+def test_values_outside_the_histogram_are_counted():
+    values, hours = day(3)
+    lo, span = value_range(values[:10], 0)
+    sketch = day_sketch(values, hours, lo, span, BINS)
+
+    inside = (values >= lo) & (values <= lo + span)
+    assert sketch['outside'].sum() == np.sum(~np.isnan(values) & ~inside)
+    assert 0 < outside_fraction(sketch) < 1
+    assert sketch['hist'].sum() == sketch['n'].sum()
+
+
+def write_day(path, date, low, high):
+    time = pd.date_range(date, periods=144, freq='10min')
+    values = np.linspace(low, high, len(time))
+    xr.Dataset({'T2M': ('time', values)}, coords={'time': time}).to_netcdf(
+        path / 'METEOGRAM_patch001_{}_koeln.nc'.format(date.replace('-', '')))
+
+
+def test_every_month_has_its_own_histograms(tmp_path):
+    config = {'paths': {'prefix_meteogram': 'METEOGRAM_patch001_', 'postfix_meteogram': '_koeln'},
+              'stats': {'directory': str(tmp_path / 'stats'), 'bins': BINS, 'workers': 1}}
+    # the first day of September does not cover the second, and December is far outside both
+    write_day(tmp_path, '2021-09-01', 0, 1)
+    write_day(tmp_path, '2021-09-02', 10, 11)
+    write_day(tmp_path, '2021-12-01', 20, 21)
+
+    result = update_statistics(config, str(tmp_path), log=lambda message: None)
+    assert result == {'added': 3, 'rebuilt': 1}
+
+    climatology = Climatology(config['stats']['directory'])
+    september, december = climatology.month('T2M', '09'), climatology.month('T2M', '12')
+    # the hours of September hold values near 0 to 1 and near 10 to 11 in equal parts
+    assert np.all(september[10] < 1.3) and np.all(september[90] > 9.7)
+    # the range of the first day of December widened by the margin of 0.5 on both sides
+    bin_width = 2 / BINS
+    np.testing.assert_allclose(december[50][:, 0], 20 + (np.arange(24) + 0.5) / 24, atol=bin_width)
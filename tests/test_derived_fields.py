@@ -0,0 +1,32 @@
+import numpy as np
+
+from utils.derived_fields import transform_hydrometeors
+
+
+def test_transform_hydrometeors_matches_per_species_loop():
+    rng = np.random.default_rng(0)
+    names = ['QC', 'QNC', 'QR', 'QNR']
+    stack = rng.uniform(0, 2e-6, (4, 6, 5)) ** 2
+    stack[0, 0, 0] = np.nan
+
+    fields = transform_hydrometeors(names, stack)
+
+    def log(values):
+        with np.errstate(divide='ignore'):
+            return np.where(values < 1e-8, -9, np.log10(values))
+    assert set(fields) == set(names) | {'total mass', 'total number'}
+    np.testing.assert_allclose(fields['QR'], log(stack[2]))
+    np.testing.assert_allclose(fields['total mass'], log(stack[0] + stack[2]))
+    # number concentrations of the single species stay linear, their total is logged
+    np.testing.assert_allclose(fields['QNC'], stack[1])
+    np.testing.assert_allclose(fields['total number'], log(stack[1] + stack[3]))
+    # missing values stay missing instead of being filled
+    assert np.isnan(fields['QC'][0, 0]) and np.isnan(fields['total mass'][0, 0])
+
+
+def test_transform_hydrometeors_keeps_precomputed_totals():
+    stack = np.full((2, 3, 4), 1e-3)
+    fields = transform_hydrometeors(['QC', 'total mass'], stack)
+
+    assert set(fields) == {'QC', 'total mass'}
+    np.testing.assert_allclose(fields['total mass'], -3)
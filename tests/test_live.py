@@ -0,0 +1,45 @@
+import numpy as np
+
+from utils.live import LiveTails, with_tail
+
+
+def grid(start, n):
+    time = np.datetime64('2021-09-09T00:00', 'ns') + (start + np.arange(n)) * np.timedelta64(10, 'm')
+    return {'time': time, 'height_2': np.array([100., 50.]),
+            'data': {'T': np.arange(2. * n).reshape(n, 2) + start}, 'end': np.asarray(time[-1])}
+
+
+def end(step):
+    return str(np.datetime64('2021-09-09T00:00', 'ns') + step * np.timedelta64(10, 'm'))
+
+
+def test_appended_steps_continue_the_result():
+    tails = LiveTails()
+    tails.append('key', end(5), grid(6, 2))
+    tails.append('key', end(7), grid(8, 3))
+
+    merged = with_tail(grid(0, 6), tails.get('key'))
+    assert len(merged['time']) == 11 and np.all(np.diff(merged['time']) > np.timedelta64(0))
+    assert merged['end'] == grid(8, 3)['end']
+    np.testing.assert_array_equal(merged['data']['T'][6:], np.vstack([grid(6, 2)['data']['T'], grid(8, 3)['data']['T']]))
+
+
+def test_steps_read_again_replace_the_kept_ones():
+    tails = LiveTails()
+    tails.append('key', end(5), grid(6, 2))
+    # a graph drawn from the result alone, e.g. in the browser, reads the steps after it again
+    tails.append('key', end(5), grid(6, 4))
+
+    tail = tails.get('key')
+    assert len(tail['grid']['time']) == 4
+    assert len(with_tail(grid(0, 6), tail)['time']) == 10
+
+
+def test_steps_that_do_not_continue_a_result_are_left_out():
+    tails = LiveTails(max_entries=1)
+    tails.append('key', end(7), grid(8, 2))
+    result = grid(0, 6)
+
+    assert with_tail(result, tails.get('key')) is result
+    tails.append('other', end(5), grid(6, 2))
+    assert tails.get('key') is None
@@ -0,0 +1,73 @@
+import numpy as np
+
+from utils.lod import block_reduce, block_times, decimation_factor, minmax_downsample, time_window
+
+
+def times(n):
+    return np.datetime64('2021-09-09T00:00', 'ns') + np.arange(n) * np.timedelta64(10, 's')
+
+
+def test_minmax_downsample_keeps_extrema_in_order():
+    values = np.sin(np.linspace(0, 20, 1001))
+    values[123], values[777] = 5, -5
+    time, selected = minmax_downsample(times(len(values)), values, 100)
+
+    assert len(selected) <= 100
+    assert np.all(np.diff(time) > np.timedelta64(0))
+    assert selected.max() == 5 and selected.min() == -5
+
+
+def test_minmax_downsample_skips_nan():
+    values = np.arange(12, dtype=float)
+    values[[0, 2, 3, 4, 5, 6, 7]] = np.nan
+    # blocks of four values, the extrema of a block are taken from its values and a block
+    # without any stays a gap in the line
+    _, selected = minmax_downsample(times(12), values, 6)
+    np.testing.assert_array_equal(selected, [1, np.nan, 8, 11])
+
+
+def test_minmax_downsample_short_series_unchanged():
+    values = np.arange(5.0)
+    time, selected = minmax_downsample(times(5), values, 10)
+    assert selected is values and len(time) == 5
+
+
+def test_block_reduce_pads_the_last_block():
+    values = np.arange(7, dtype=float)[:, None] * [1, 10]
+    reduced = block_reduce(values, 3)
+
+    np.testing.assert_allclose(reduced, [[1, 10], [4, 40], [6, 60]])
+    np.testing.assert_allclose(block_reduce(values, 3, how='max'), [[2, 20], [5, 50], [6, 60]])
+
+
+def test_block_reduce_nan_blocks_stay_nan():
+    values = np.array([np.nan, np.nan, 1, np.nan, 3, 5])
+    np.testing.assert_allclose(block_reduce(values, 2), [np.nan, 1, 4])
+
+
+def test_block_reduce_other_axis():
+    values = np.arange(12, dtype=float).reshape(2, 6)
+    np.testing.assert_allclose(block_reduce(values, 3, axis=1), [[1, 4], [7, 10]])
+
+
+def test_block_times_are_centres_of_the_blocks():
+    time = times(7)
+    centres = block_times(time, 3)
+
+    assert len(centres) == 3
+    assert centres[0] == time[1] and centres[1] == time[4]
+    # the last block only holds a single time step
+    assert centres[2] == time[6]
+
+
+def test_decimation_factor():
+    assert decimation_factor(1440, 150, 30000) == 8
+    assert decimation_factor(10, 10, 30000) == 1
+
+
+def test_time_window_is_in_ns():
+    short = time_window({'xaxis.range[0]': '2021-09-09 06:00', 'xaxis.range[1]': '2021-09-09 07:30:00.5'})
+    long = time_window({'xaxis.range': ['2021-09-09 06:00:00.000', '2021-09-09 07:30:00.500000']})
+
+    assert repr(short) == repr(long)
+    assert time_window({'xaxis.autorange': True}) is None
@@ -0,0 +1,114 @@
+import base64
+
+import numpy as np
+
+# short names of the dtypes of the plotly.js typed array spec
+DTYPES = {'float32': 'f4', 'float64': 'f8', 'int8': 'i1', 'uint8': 'u1', 'int16': 'i2',
+          'uint16': 'u2', 'int32': 'i4', 'uint32': 'u4'}
+
+
+def encode_array(values : np.ndarray, dtype : str = 'float32') -> dict:
+    """ Encode an array as base64 in the typed array spec of plotly.js. Times are written
+    as milliseconds since 1970 in float64, which plotly reads on a date axis.
+
+    :param values: numeric or datetime64 array
+    :param dtype: dtype the numeric values are sent as, e.g. 'float32'
+    :return: dictionary with dtype, bdata and for more than one dimension the shape
+    """
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = time_ms(values)
+        encoded = {'dtype': 'f8', 'time': True}
+    else:
+        values = np.asarray(values, dtype=dtype)
+        encoded = {'dtype': DTYPES[str(values.dtype)]}
+    encoded['bdata'] = base64.b64encode(np.ascontiguousarray(values)).decode('ascii')
+    if values.ndim > 1:
+        encoded['shape'] = ', '.join(str(size) for size in values.shape)
+    return encoded
+
+
+def time_ms(values : np.ndarray) -> np.ndarray:
+    """ Convert times to milliseconds since 1970, the numbers plotly reads on a date axis
+
+    :param values: datetime64 array
+    :return: float64 array, NaT becomes NaN
+    """
+    ms = np.asarray(values).astype('datetime64[ms]')
+    return np.where(np.isnat(ms), np.nan, ms.astype(np.int64).astype(np.float64))
+
+
+def decode_array(encoded : dict) -> np.ndarray:
+    """ Decode an array written by encode_array
+
+    :param encoded: typed array spec
+    :return: array, float64 or datetime64[ns] for times
+    """
+    values = np.frombuffer(base64.b64decode(encoded['bdata']), dtype=np.dtype(encoded['dtype']))
+    if 'shape' in encoded:
+        values = values.reshape([int(size) for size in encoded['shape'].split(',')])
+    if encoded.get('time'):
+        times = np.full(values.shape, np.datetime64('NaT'), dtype='datetime64[ns]')
+        valid = ~np.isnan(values)
+        times[valid] = values[valid].astype(np.int64).astype('datetime64[ms]')
+        return times
+    return values.astype(np.float64)
+
+
+def is_encoded(value) -> bool:
+    """ Check if a value is an array in the typed array spec """
+    return isinstance(value, dict) and 'bdata' in value and 'dtype' in value
+
+
+def encode_binary(grid : dict, dtype : str = 'float32') -> dict:
+    """ Convert a gridded result with NumPy arrays to base64 typed arrays
+
+    :param grid: dictionary of arrays, possibly nested
+    :param dtype: dtype the numeric values are sent as
+    :return: dictionary of typed array specs, the end of the data is written as iso string
+    """
+    encoded = {}
+    for name, values in grid.items():
+        if isinstance(values, dict):
+            encoded[name] = encode_binary(values, dtype)
+        elif name == 'end':
+            encoded[name] = str(np.datetime_as_string(values, unit='ns'))
+        else:
+            encoded[name] = encode_array(values, dtype)
+    return encoded
+
+
+def decode_binary(data : dict) -> dict:
+    """ Convert a gridded result written by encode_binary back to NumPy arrays
+
+    :param data: dictionary of typed array specs
+    :return: dictionary of arrays
+    """
+    grid = {}
+    for name, values in data.items():
+        if is_encoded(values):
+            grid[name] = decode_array(values)
+        elif isinstance(values, dict):
+            grid[name] = decode_binary(values)
+        elif name == 'end':
+            grid[name] = np.asarray(values, dtype='datetime64[ns]')
+    return grid
+
+
+def typed_figure(figure : dict, dtype : str = 'float32') -> dict:
+    """ Send the arrays of the traces of a figure as typed arrays, requires plotly.js 2.28 or newer,
+    which is served by dash 2.17 and newer from the plotly package
+
+    :param figure: figure dictionary
+    :param dtype: dtype the numeric values are sent as
+    :return: the figure with x, y and z as typed array specs, time axes are set to type date
+    """
+    for trace in figure.get('data', []):
+        for axis in ['x', 'y', 'z']:
+            values = trace.get(axis)
+            if not isinstance(values, np.ndarray) or values.size == 0 or values.dtype == object:
+                continue
+            if np.issubdtype(values.dtype, np.datetime64):
+                # numbers on an axis are only read as milliseconds if the axis is a date axis
+                figure.setdefault('layout', {}).setdefault(axis + 'axis', {})['type'] = 'date'
+            trace[axis] = encode_array(values, dtype)
+    return figure
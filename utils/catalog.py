@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from .dataset_cache import file_identity, list_meteogram_files, meteogram_date
+from .sidecar import preferred_source
+
+
+def catalog_config(config : dict) -> dict:
+    """ Return the catalog settings with defaults filled in
+
+    :param config: app configuration, the settings are read from the [catalog] table
+    :return: dictionary with the polling interval and the number of directories kept
+    """
+    catalog = config.get('catalog', {})
+    return {'poll_seconds': catalog.get('poll_seconds', 30),
+            'max_paths': catalog.get('max_paths', 8)}
+
+
+class Catalog:
+    """ Inventory of the meteogram files in a data directory.
+
+    For every date the file, its size and the variables and dimensions it contains are
+    recorded. The directory is scanned again at most every poll_seconds, only files that
+    are new or were changed since, i.e. whose modification time differs, are opened.
+    The files are opened without holding the lock of the entries, so looking up a file
+    that is already known never waits for a scan. A file that cannot be read, e.g. because
+    it is still being written, is left out and tried again on the next scan.
+    """
+
+    def __init__(self, config : dict, path : str, poll_seconds : float = 30):
+        """
+        :param config: app configuration
+        :param path: path to the data
+        :param poll_seconds: minimum time between two scans of the directory
+        """
+        self.config = config
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self._entries = {}
+        self._scanned = None
+        # the entries are replaced instead of changed under _lock, other threads may iterate
+        # over them; _scan_lock lets only one thread scan the directory at a time
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+
+    def refresh(self, force : bool = False):
+        """ Scan the directory for new, changed and removed files
+
+        :param force: scan even if the last scan is more recent than poll_seconds
+        """
+        if not force and self._scanned is not None and time.monotonic() - self._scanned < self.poll_seconds:
+            return
+        # only the first scan is waited for, later ones keep the current entries until they are done
+        if not self._scan_lock.acquire(blocking=self._scanned is None or force):
+            return
+        try:
+            if not force and self._scanned is not None and time.monotonic() - self._scanned < self.poll_seconds:
+                # another thread scanned while this one was waiting
+                return
+            files = list_meteogram_files(self.config, self.path)
+            previous = self._entries
+            entries = {seldate: self._scan(filename, previous.get(seldate)) for seldate, filename in files.items()}
+            with self._lock:
+                # files that vanished between listing and scanning or cannot be read are dropped
+                self._entries = {seldate: entry for seldate, entry in entries.items() if entry is not None}
+            self._scanned = time.monotonic()
+        finally:
+            self._scan_lock.release()
+
+    def _scan(self, filename : str, entry : dict = None):
+        """ Describe a meteogram file, reusing entry if the file did not change
+
+        :param filename: path to the meteogram file
+        :param entry: previous description of the file
+        :return: dictionary describing the file or None if it does not exist or cannot be read
+        """
+        # the file that is actually read is checked, so that a new sidecar is noticed as well
+        source, engine = preferred_source(self.config, filename)
+        try:
+            identity = file_identity(source)
+        except FileNotFoundError:
+            return None
+        if entry is not None and entry['identity'] == identity:
+            return entry
+        # xarray and the NetCDF backend are only imported when the first file is scanned
+        import xarray as xr
+
+        try:
+            with xr.open_dataset(source, engine=engine) as ds:
+                return {'filename': filename, 'identity': identity, 'size': os.path.getsize(source),
+                        'variables': sorted(ds.data_vars), 'dims': dict(ds.sizes)}
+        except (OSError, ValueError):
+            # a truncated file or one that is still being written, without an entry it is
+            # opened again on the next scan
+            return None
+
+    @property
+    def entries(self) -> dict:
+        """ Description of every meteogram file, keyed by the date as YYYY-MM-DD """
+        self.refresh()
+        return self._entries
+
+    def entry(self, filename : str):
+        """ Description of a single meteogram file. A file that is not known yet or
+        changed is scanned and recorded without scanning the whole directory.
+
+        :param filename: path to the meteogram file
+        :return: dictionary with filename, size, variables and dims or None if there is no such file
+        """
+        seldate = meteogram_date(self.config, filename)
+        if seldate is None:
+            return self._scan(filename)
+        previous = self._entries.get(seldate)
+        if previous is not None and os.path.realpath(previous['filename']) != os.path.realpath(filename):
+            previous = None
+        # an unchanged file is only checked with a stat, a new or changed one is opened once
+        entry = self._scan(filename, previous)
+        if entry is not previous:
+            with self._lock:
+                entries = dict(self._entries)
+                if entry is None:
+                    entries.pop(seldate, None)
+                else:
+                    entries[seldate] = entry
+                self._entries = entries
+        return entry
+
+    def files(self) -> dict:
+        """ Path of the meteogram file for every available date, sorted by date """
+        return {seldate: entry['filename'] for seldate, entry in self.entries.items()}
+
+    def variables(self) -> set:
+        """ Variables that exist in at least one file """
+        return set().union(*[entry['variables'] for entry in self.entries.values()])
+
+    def disabled_days(self) -> list:
+        """ Dates between the first and the last available date that have no file """
+        entries = self.entries
+        if not entries:
+            return []
+        dates = list(entries)
+        first, last = date.fromisoformat(dates[0]), date.fromisoformat(dates[-1])
+        days = (first + timedelta(days=i) for i in range((last - first).days + 1))
+        return [day.isoformat() for day in days if day.isoformat() not in entries]
+
+
+_catalogs = OrderedDict()
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(config : dict, path : str) -> Catalog:
+    """ Return the catalog of a data directory shared by all callbacks, creating it on first use
+
+    :param config: app configuration, the catalogs are configured in the [catalog] table
+    :param path: path to the data
+    :return: shared Catalog, the catalogs of the least recently used directories are dropped
+    """
+    settings = catalog_config(config)
+    key = os.path.realpath(path)
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = Catalog(config, path, poll_seconds=settings['poll_seconds'])
+            # every path typed into the path input gets a catalog, only the recent ones are kept
+            while len(_catalogs) > max(settings['max_paths'], 1):
+                _catalogs.popitem(last=False)
+        _catalogs.move_to_end(key)
+        return _catalogs[key]
+
+
+def available_variables(config : dict, filename : str, var_list : list) -> list:
+    """ Variables of a list that exist in a meteogram file, looked up in the catalog
+
+    :param config: app configuration
+    :param filename: path to the meteogram file
+    :param var_list: variables to check, the list is not modified
+    :return: list of the variables that exist in the file
+    """
+    entry = get_catalog(config, os.path.dirname(filename)).entry(filename)
+    if entry is None:
+        return []
+    return [var for var in var_list if var in entry['variables']]
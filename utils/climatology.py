@@ -0,0 +1,465 @@
+import json
+import os
+import threading
+import warnings
+
+import numpy as np
+
+from .dataset_cache import file_identity, list_meteogram_files
+from .sidecar import preferred_source
+from .variables import VARS_1D, VARS_TIMEHEIGHT
+
+# variables of the panels that get an overlay
+STATS_VARIABLES = list(VARS_1D) + list(VARS_TIMEHEIGHT)
+# percentiles drawn in the overlays
+PERCENTILES = [10, 50, 90]
+
+
+def stats_config(config : dict) -> dict:
+    """ Return the statistics settings with defaults filled in
+
+    :param config: app configuration, the settings are read from the [stats] table
+    :return: dictionary with the directory, the number of histogram bins, their margin, the
+        tolerated fraction of values outside them and worker processes
+    """
+    stats = config.get('stats', {})
+    return {'directory': stats.get('directory', './stats'),
+            'bins': stats.get('bins', 64),
+            # the value range of the histograms of a month is the range of its first file widened
+            # by this fraction of it on both sides, values outside are counted in the outer bins
+            'margin': stats.get('margin', 0.5),
+            # a month with more values outside its histograms is computed again with the range
+            # of all its values
+            'max_outside': stats.get('max_outside', 0.01),
+            'workers': stats.get('workers', 0) or os.cpu_count() or 1}
+
+
+def empty_sketch(lo : np.ndarray, span : np.ndarray, bins : int) -> dict:
+    """ Sketch of a variable without any values
+
+    A sketch holds for every hour of the day and level the number of values, their mean,
+    the sum of squared deviations from the mean, their minimum and maximum, the number of
+    values outside the histogram and a histogram with fixed bins. The lower edge and the
+    width of the histogram of every level are kept with it. Two sketches with the same bins
+    are merged exactly, so days can be added one at a time.
+
+    :param lo: lower edge of the histogram of every level
+    :param span: width of the histogram of every level
+    :param bins: number of histogram bins
+    :return: dictionary of arrays with the hour of the day as first axis
+    """
+    n_levels = len(lo)
+    return {'n': np.zeros((24, n_levels), dtype=np.int64),
+            'mean': np.zeros((24, n_levels)),
+            'm2': np.zeros((24, n_levels)),
+            'min': np.full((24, n_levels), np.nan),
+            'max': np.full((24, n_levels), np.nan),
+            'outside': np.zeros((24, n_levels), dtype=np.int64),
+            'hist': np.zeros((24, n_levels, bins), dtype=np.int64),
+            'lo': np.asarray(lo, dtype=float), 'span': np.asarray(span, dtype=float)}
+
+
+def merge_sketches(a : dict, b : dict) -> dict:
+    """ Combine two sketches with the same bins (Chan et al. for the mean and variance)
+
+    :param a: sketch, it is updated in place
+    :param b: sketch that is added
+    :return: the updated sketch a
+    """
+    n = a['n'] + b['n']
+    delta = b['mean'] - a['mean']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(n > 0, b['n'] / n, 0)
+    a['mean'] += delta * weight
+    a['m2'] += b['m2'] + delta**2 * a['n'] * weight
+    a['n'] = n
+    a['min'] = np.fmin(a['min'], b['min'])
+    a['max'] = np.fmax(a['max'], b['max'])
+    a['outside'] += b['outside']
+    a['hist'] += b['hist']
+    return a
+
+
+def outside_fraction(sketch : dict) -> float:
+    """ Fraction of the values of a sketch that are outside the range of its histograms
+
+    :param sketch: sketch of a variable
+    :return: fraction between 0 and 1, 0 without values
+    """
+    total = sketch['n'].sum()
+    return sketch['outside'].sum() / total if total else 0.
+
+
+def value_range(values : np.ndarray, margin : float) -> tuple:
+    """ Lower edge and width of the histogram bins of every level
+
+    :param values: array of shape (time, level), or the minima and maxima of a sketch stacked
+    :param margin: fraction of the range added on both sides
+    :return: tuple of the lower edge and the span of the histogram per level
+    """
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        # levels without any value get the range 0 to 1
+        warnings.simplefilter('ignore', RuntimeWarning)
+        lo = np.nan_to_num(np.nanmin(values, axis=0))
+        hi = np.nan_to_num(np.nanmax(values, axis=0), nan=1)
+    span = hi - lo
+    # constant fields still get bins of a finite width
+    span = np.maximum(span, np.maximum(np.abs(lo) * 1e-3, 1e-12))
+    return lo - margin * span, span * (1 + 2 * margin)
+
+
+def day_sketch(values : np.ndarray, hours : np.ndarray, lo : np.ndarray, span : np.ndarray, bins : int) -> dict:
+    """ Sketch of the values of one day
+
+    :param values: array of shape (time, level), NaN values are left out
+    :param hours: hour of the day of every time step
+    :param lo: lower edge of the histogram of every level
+    :param span: width of the histogram of every level
+    :param bins: number of histogram bins
+    :return: sketch as returned by empty_sketch
+    """
+    sketch = empty_sketch(lo, span, bins)
+    n_time, n_levels = values.shape
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0)
+    # sums per hour as a product with the one-hot matrix of the hours
+    onehot = np.zeros((24, n_time))
+    onehot[hours, np.arange(n_time)] = 1
+    n = onehot @ valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(n > 0, (onehot @ filled) / n, 0)
+    deviation = np.where(valid, values - mean[hours], 0)
+    sketch.update(n=n.astype(np.int64), mean=mean, m2=onehot @ deviation**2)
+    # fmin and fmax skip the missing values, hours without any value stay NaN
+    np.fmin.at(sketch['min'], (hours[:, None], np.arange(n_levels)), values)
+    np.fmax.at(sketch['max'], (hours[:, None], np.arange(n_levels)), values)
+
+    # values outside the range of the histogram are counted in its first and last bin, and
+    # counted separately so that a range that does not fit the month is noticed
+    outside = valid & ((filled < lo) | (filled > lo + span))
+    sketch['outside'] = (onehot @ outside).astype(np.int64)
+    index = np.clip(np.floor((filled - lo) / span * bins), 0, bins - 1).astype(np.int64)
+    cell = (hours[:, None] * n_levels + np.arange(n_levels)) * bins + index
+    sketch['hist'] = np.bincount(cell[valid], minlength=24 * n_levels * bins).reshape(24, n_levels, bins)
+    return sketch
+
+
+def sketch_range(sketch : dict, margin : float) -> tuple:
+    """ Histogram range of every level that holds all values added to a sketch
+
+    :param sketch: sketch of a variable
+    :param margin: fraction of the range added on both sides
+    :return: tuple of the lower edge and the span per level
+    """
+    return value_range(np.concatenate([sketch['min'], sketch['max']]), margin)
+
+
+def read_values(ds, var : str) -> np.ndarray:
+    """ Values of a variable as (time, level) array, 1-D variables have a single level """
+    values = ds[var].values.astype(np.float64)
+    return values[:, None] if values.ndim == 1 else values
+
+
+def file_sketches(config : dict, filename : str, edges : dict, bins : int) -> dict:
+    """ Sketches of all variables of one meteogram file, run in a worker process
+
+    :param config: app configuration
+    :param filename: path to the meteogram file
+    :param edges: lower edge and span of the histograms of every variable that is computed
+    :param bins: number of histogram bins
+    :return: dictionary of the sketch of every variable that is in the file and has edges
+    """
+    import xarray as xr
+
+    source, engine = preferred_source(config, filename)
+    with xr.open_dataset(source, engine=engine) as ds:
+        hours = ds.time.dt.hour.values
+        return {var: day_sketch(read_values(ds, var), hours, *edges[var], bins)
+                for var in STATS_VARIABLES if var in ds and var in edges}
+
+
+def file_edges(config : dict, filename : str, margin : float) -> dict:
+    """ Histogram ranges of all variables from the values of one file
+
+    :param config: app configuration
+    :param filename: path to the meteogram file
+    :param margin: fraction of the range added on both sides
+    :return: dictionary of the lower edge and span per level of every variable
+    """
+    import xarray as xr
+
+    source, engine = preferred_source(config, filename)
+    with xr.open_dataset(source, engine=engine) as ds:
+        return {var: value_range(read_values(ds, var), margin) for var in STATS_VARIABLES if var in ds}
+
+
+class StatisticsStore:
+    """ Sketches of every variable and calendar month, persisted in a directory.
+
+    Every month of every variable is a .npz file with the sketch and its histogram ranges,
+    index.json records the identity of the files that were added. The ranges of a month are
+    taken from its first file and kept, so that sketches of later days can be merged.
+    """
+
+    def __init__(self, directory : str):
+        """
+        :param directory: directory of the statistics
+        """
+        self.directory = directory
+
+    def _path(self, name : str) -> str:
+        return os.path.join(self.directory, name)
+
+    def index(self) -> dict:
+        """ Files that were added to every month and the number of bins
+
+        :return: dictionary with 'bins' and 'months', a dictionary of the month as MM and
+            the files added to it with their identity
+        """
+        try:
+            with open(self._path('index.json')) as fp:
+                return json.load(fp)
+        except FileNotFoundError:
+            return {'bins': None, 'months': {}}
+
+    def version(self):
+        """ Modification time of the index, changes whenever statistics are written """
+        try:
+            return os.stat(self._path('index.json')).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def sketch(self, var : str, month : str):
+        """ Sketch of a variable and month
+
+        :param var: variable
+        :param month: calendar month as MM
+        :return: sketch or None if there are no statistics
+        """
+        try:
+            with np.load(self._path('{}_{}.npz'.format(var.replace(' ', '_'), month))) as data:
+                return {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            return None
+
+    def write_month(self, month : str, sketches : dict, files : dict, bins : int):
+        """ Replace the sketches of a month and record the files they contain
+
+        :param month: calendar month as MM
+        :param sketches: sketch of every variable
+        :param files: identity of every file added, keyed by file name
+        :param bins: number of histogram bins
+        """
+        for var, sketch in sketches.items():
+            self._write_npz('{}_{}.npz'.format(var.replace(' ', '_'), month), sketch)
+        index = self.index()
+        index['bins'] = bins
+        index['months'][month] = files
+        # the index is written last, an interrupted update is repeated on the next run
+        tmpname = self._path('index.json.tmp')
+        with open(tmpname, 'w') as fp:
+            json.dump(index, fp, indent=1)
+        os.replace(tmpname, self._path('index.json'))
+
+    def _write_npz(self, name : str, arrays : dict):
+        os.makedirs(self.directory, exist_ok=True)
+        tmpname = self._path(name + '.tmp.npz')
+        np.savez(tmpname, **arrays)
+        os.replace(tmpname, self._path(name))
+
+
+def update_statistics(config : dict, path : str, workers : int = None, rebuild : bool = False, log=print) -> dict:
+    """ Add the days that are new since the last update to the statistics
+
+    The months are updated one after the other. The days of a month are read in parallel
+    by a process pool, every worker reads one day and only returns its sketches, which are
+    merged as they arrive. So at most one day per worker is held in memory. A month
+    in which a day was changed or removed is computed again from all its days, and so is
+    a variable whose values of a month are too often outside the histograms of the month.
+
+    :param config: app configuration
+    :param path: path to the data
+    :param workers: number of worker processes, defaults to [stats] workers
+    :param rebuild: compute all statistics again, e.g. after changing the bins
+    :param log: function called with progress messages
+    :return: dictionary with the number of days added and months rebuilt
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    settings = stats_config(config)
+    store = StatisticsStore(settings['directory'])
+    index = store.index()
+    bins = settings['bins']
+    if index['bins'] not in (None, bins):
+        # sketches with different bins cannot be merged
+        rebuild = True
+
+    # the files of every calendar month with their current identity
+    months = {}
+    for seldate, filename in list_meteogram_files(config, path).items():
+        months.setdefault(seldate[5:7], {})[filename] = list(file_identity(filename))
+
+    def merge_files(executor, filenames, edges, sketches):
+        """ Add the sketches of files to sketches as they arrive from the workers """
+        futures = [executor.submit(file_sketches, config, filename, edges, bins) for filename in filenames]
+        for future in as_completed(futures):
+            for var, sketch in future.result().items():
+                if var in sketches:
+                    merge_sketches(sketches[var], sketch)
+                else:
+                    sketches[var] = sketch
+        return sketches
+
+    added = rebuilt = 0
+    with ProcessPoolExecutor(max_workers=workers or settings['workers']) as executor:
+        for month, files in sorted(months.items()):
+            known = {} if rebuild else index['months'].get(month, {})
+            sketches = {}
+            if known:
+                sketches = {var: sketch for var in STATS_VARIABLES
+                            if (sketch := store.sketch(var, month)) is not None}
+            if any(files.get(filename) != identity for filename, identity in known.items()):
+                # a day changed or vanished, its values cannot be taken out of the sketches
+                log('month {}: files changed, computing it again'.format(month))
+                known, sketches = {}, {}
+                rebuilt += 1
+            new = [filename for filename in files if filename not in known]
+            if not new:
+                continue
+
+            # every month has its own histogram ranges, the values of the seasons differ too
+            # much to share them, and a month that is new gets them from its first day
+            if sketches:
+                edges = {var: (sketch['lo'], sketch['span']) for var, sketch in sketches.items()}
+            else:
+                edges = file_edges(config, new[0], settings['margin'])
+            merge_files(executor, new, edges, sketches)
+            added += len(new)
+
+            # the first day does not always cover the values of the month, a variable with too
+            # many values in the outer bins is read again with the range of all its values
+            wide = {var: sketch_range(sketch, settings['margin']) for var, sketch in sketches.items()
+                    if outside_fraction(sketch) > settings['max_outside']}
+            if wide:
+                log('month {}: {} outside the histograms, computing them again'.format(month, ', '.join(wide)))
+                sketches.update(merge_files(executor, list(files), wide, {}))
+                rebuilt += 1
+            store.write_month(month, sketches, {filename: files[filename] for filename in list(known) + new}, bins)
+            log('month {}: {} days added'.format(month, len(new)))
+    return {'added': added, 'rebuilt': rebuilt}
+
+
+def sketch_percentiles(sketch : dict, percentiles : list) -> dict:
+    """ Percentiles from the histograms of a sketch, interpolated linearly within a bin
+
+    :param sketch: sketch of a variable
+    :param percentiles: percentiles between 0 and 100
+    :return: dictionary of a (hour, level) array per percentile, NaN without values
+    """
+    hist = sketch['hist']
+    bins = hist.shape[-1]
+    cumulative = np.cumsum(hist, axis=-1)
+    total = cumulative[..., -1:]
+    result = {}
+    for percentile in percentiles:
+        target = total * percentile / 100
+        # first bin in which the cumulative count reaches the target
+        index = np.minimum((cumulative < target).sum(axis=-1, keepdims=True), bins - 1)
+        below = np.take_along_axis(cumulative, index, axis=-1) - np.take_along_axis(hist, index, axis=-1)
+        inside = np.take_along_axis(hist, index, axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraction = np.clip(np.where(inside > 0, (target - below) / inside, 0.5), 0, 1)
+        values = sketch['lo'] + sketch['span'] * (index + fraction)[..., 0] / bins
+        result[percentile] = np.where(total[..., 0] > 0, values, np.nan)
+    return result
+
+
+class Climatology:
+    """ Statistics of the variables looked up for the time steps of a graph.
+
+    The mean, standard deviation and percentiles of a month are derived from its sketch
+    when they are first needed and kept until the statistics are updated on disk.
+    """
+
+    def __init__(self, directory : str):
+        """
+        :param directory: directory of the statistics
+        """
+        self.store = StatisticsStore(directory)
+        self._version = None
+        self._months = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """ Version of the statistics on disk, None if there are none """
+        return self.store.version()
+
+    def month(self, var : str, month : str):
+        """ Statistics of a variable and calendar month
+
+        :param var: variable
+        :param month: calendar month as MM
+        :return: dictionary of (hour, level) arrays 'mean', 'std' and the percentiles, or None
+        """
+        with self._lock:
+            version = self.store.version()
+            if version != self._version:
+                self._months = {}
+                self._version = version
+            key = (var, month)
+            if key not in self._months:
+                self._months[key] = self._derive(var, month)
+            return self._months[key]
+
+    def _derive(self, var : str, month : str):
+        sketch = self.store.sketch(var, month)
+        if sketch is None:
+            return None
+        with np.errstate(invalid='ignore', divide='ignore'):
+            n = sketch['n']
+            stats = {'mean': np.where(n > 0, sketch['mean'], np.nan),
+                     'std': np.where(n > 1, np.sqrt(sketch['m2'] / np.maximum(n - 1, 1)), np.nan)}
+        stats.update(sketch_percentiles(sketch, PERCENTILES))
+        return stats
+
+    def at(self, var : str, time : np.ndarray):
+        """ Statistics of the calendar month and hour of the day of every time step
+
+        :param var: variable
+        :param time: datetime64 time steps of a graph
+        :return: dictionary of (time, level) arrays or None if no month has statistics
+        """
+        time = np.asarray(time, dtype='datetime64[ns]')
+        months = time.astype('datetime64[M]').astype(np.int64) % 12 + 1
+        hours = (time - time.astype('datetime64[D]')).astype('timedelta64[h]').astype(np.int64)
+        result = None
+        for month in np.unique(months):
+            stats = self.month(var, '{:02d}'.format(month))
+            if stats is None:
+                continue
+            if result is None:
+                n_levels = stats['mean'].shape[1]
+                result = {name: np.full((len(time), n_levels), np.nan) for name in stats}
+            selected = months == month
+            for name, values in stats.items():
+                if values.shape[1] == n_levels:
+                    result[name][selected] = values[hours[selected]]
+        return result
+
+
+_climatologies = {}
+_climatologies_lock = threading.Lock()
+
+
+def get_climatology(config : dict) -> Climatology:
+    """ Return the climatology shared by all callbacks, creating it on first use
+
+    :param config: app configuration, the directory is read from the [stats] table
+    :return: shared Climatology
+    """
+    directory = os.path.realpath(stats_config(config)['directory'])
+    with _climatologies_lock:
+        if directory not in _climatologies:
+            _climatologies[directory] = Climatology(directory)
+        return _climatologies[directory]
@@ -0,0 +1,30 @@
+import pathlib
+
+import tomli
+
+
+def load_config(config_path : str = './assets/config.toml') -> dict:
+    """ Read the TOML configuration of the dashboard
+
+    :param config_path: path to the configuration file
+    :return: configuration as dictionary, empty if the file does not exist
+    """
+    config_path = pathlib.Path(config_path)
+    if config_path.exists():
+        with config_path.open(mode="rb") as fp:
+            return tomli.load(fp)
+    return {}
+
+
+def server_config(config : dict) -> dict:
+    """ Return the settings of the production server with defaults filled in
+
+    :param config: app configuration, the settings are read from the [server] table
+    :return: dictionary with host, port, workers, threads and timeout in seconds
+    """
+    server = config.get('server', {})
+    return {'host': server.get('host', '127.0.0.1'),
+            'port': server.get('port', 8050),
+            'workers': server.get('workers', 2),
+            'threads': server.get('threads', 4),
+            'timeout': server.get('timeout', 120)}
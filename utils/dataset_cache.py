@@ -0,0 +1,261 @@
+import glob
+import importlib.util
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from .sidecar import preferred_source
+from .metrics import timed, count
+
+if TYPE_CHECKING:
+    import xarray as xr
+
+
+class DatasetCache:
+    """ Least recently used cache of opened meteogram data sets.
+
+    Entries are keyed by the resolved file path and its modification time, so a
+    file that is rewritten on disk is opened again instead of being served stale.
+    Data sets that are evicted from the cache are closed explicitly.
+    """
+
+    def __init__(self, max_entries : int = 8, max_memory_mb : float = 2048, resolve=None, chunks : dict = None):
+        """
+        :param max_entries: maximum number of data sets kept open
+        :param max_memory_mb: maximum decoded size of all cached data sets in MB
+        :param resolve: optional function returning the file that is actually opened for
+            a meteogram file, e.g. an up to date sidecar, together with its xarray engine
+        :param chunks: optional dask chunks, the data sets are then opened lazily and only
+            the selected and reduced data is loaded (requires the dask package)
+        """
+        self.max_entries = max_entries
+        self.resolve = resolve
+        self.chunks = chunks
+        self.max_bytes = max_memory_mb * 1024**2
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filename : str) -> 'xr.Dataset':
+        """ Return the data set stored in filename, opening it if it is not cached
+
+        :param filename: path to the netcdf file
+        :return: xarray dataset
+        """
+        with timed('open'):
+            return self._get(filename)
+
+    def _get(self, filename : str) -> 'xr.Dataset':
+        engine = None
+        if self.resolve is not None:
+            filename, engine = self.resolve(filename)
+        key = file_identity(filename)
+        resolved = key[0]
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                count('dataset_cache_hits')
+                return self._entries[key]
+            self.misses += 1
+            count('dataset_cache_misses')
+
+        # xarray and the NetCDF backend are only imported when the first file is opened
+        import xarray as xr
+
+        # the file is opened without holding the lock, so that other threads are not blocked
+        # by a slow open and a process forked meanwhile does not inherit a held lock
+        ds = xr.open_dataset(resolved, engine=engine, chunks=self.chunks)
+        with self._lock:
+            if key in self._entries:
+                # another thread opened the same file in the meantime
+                ds.close()
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            # drop an older version of the same file, it has been rewritten since
+            for old_key in [k for k in self._entries if k[0] == resolved]:
+                self._entries.pop(old_key).close()
+            self._entries[key] = ds
+            self._evict()
+            return ds
+
+    def warm(self, filename : str):
+        """ Open a file into the cache only if it fits next to the cached data sets, used
+        to prefetch files without evicting the ones that are shown
+
+        :param filename: path to the netcdf file
+        :return: xarray dataset or None if it would exceed the budget of the cache
+        """
+        engine = None
+        if self.resolve is not None:
+            filename, engine = self.resolve(filename)
+        key = file_identity(filename)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+        import xarray as xr
+
+        ds = xr.open_dataset(key[0], engine=engine, chunks=self.chunks)
+        # the decoded size is known before the values are read
+        size = sum(var.nbytes for var in ds.variables.values() if var.chunks is None)
+        with self._lock:
+            if key in self._entries:
+                ds.close()
+                return self._entries[key]
+            if len(self._entries) >= self.max_entries or self.nbytes + size > self.max_bytes:
+                ds.close()
+                return None
+            # a prefetched file is the first to be evicted, until it is actually shown
+            self._entries[key] = ds
+            self._entries.move_to_end(key, last=False)
+            return ds
+
+    def touch(self, filename : str):
+        """ Mark the data set of a file as most recently used if it is cached
+
+        :param filename: path to the netcdf file
+        """
+        if self.resolve is not None:
+            filename, _ = self.resolve(filename)
+        try:
+            key = file_identity(filename)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def _evict(self):
+        """ Close and remove the least recently used data sets until the cache is
+        within its budget. The most recently added data set is always kept.
+        """
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                          or self.nbytes > self.max_bytes):
+            _, ds = self._entries.popitem(last=False)
+            ds.close()
+
+    @property
+    def lazy(self) -> bool:
+        """ True if the data sets are opened with dask chunks """
+        return self.chunks is not None
+
+    @property
+    def nbytes(self) -> int:
+        """ Decoded size of all cached data sets in bytes, variables that are
+        chunked with dask are only loaded on demand and not counted
+        """
+        return sum(var.nbytes for ds in self._entries.values()
+                   for var in ds.variables.values() if var.chunks is None)
+
+    def clear(self):
+        """ Close all cached data sets and reset the counters """
+        with self._lock:
+            while self._entries:
+                _, ds = self._entries.popitem(last=False)
+                ds.close()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """ Return the cache counters
+
+        :return: dictionary with hits, misses, number of entries and size in bytes
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._entries), 'nbytes': self.nbytes}
+
+
+def file_identity(filename : str) -> tuple:
+    """ Identify the current version of a file by its resolved path, modification time and size.
+    The size catches a file that is rewritten within the resolution of the modification time.
+
+    :param filename: path to the file
+    :return: tuple of resolved path, modification time in ns and size in bytes
+    """
+    resolved = os.path.realpath(filename)
+    stat = os.stat(resolved)
+    return resolved, stat.st_mtime_ns, stat.st_size
+
+
+_cache = None
+
+
+def get_dataset_cache(config : dict) -> DatasetCache:
+    """ Return the dataset cache shared by all callbacks, creating it on first use
+
+    :param config: app configuration, the budget is read from the [cache] table
+    :return: shared DatasetCache
+    """
+    global _cache
+    if _cache is None:
+        cache_config = config.get('cache', {})
+        chunks = {'time': cache_config.get('time_chunk', 360)} if cache_config.get('lazy', False) else None
+        _cache = DatasetCache(max_entries=cache_config.get('max_entries', 8),
+                              max_memory_mb=cache_config.get('max_memory_mb', 2048),
+                              resolve=lambda filename: preferred_source(config, filename),
+                              chunks=chunks)
+    return _cache
+
+
+def check_lazy(config : dict):
+    """ Check that the files can be opened as configured on this machine
+
+    :param config: app configuration, the mode is read from the [cache] table
+    :raise ValueError: if lazy loading is requested and dask is not installed
+    """
+    if config.get('cache', {}).get('lazy', False) and importlib.util.find_spec('dask') is None:
+        raise ValueError('lazy = true in the [cache] table requires the dask package, install it or set lazy = false')
+
+
+def meteogram_path(config : dict, path : str, seldate : str) -> str:
+    """ Build the path of the meteogram file for a date
+
+    :param config: app configuration with prefix and postfix of the meteogram files
+    :param path: path to the data
+    :param seldate: selected date as YYYY-MM-DD
+    :return: path to the netcdf file
+    """
+    # convert date to YYYYMMDD format
+    seldate = datetime.strptime(seldate, '%Y-%m-%d').strftime('%Y%m%d')
+    return path + '/' + config['paths']['prefix_meteogram'] + seldate + config['paths']['postfix_meteogram'] + '.nc'
+
+
+def list_meteogram_files(config : dict, path : str) -> dict:
+    """ Find all meteogram files in a directory
+
+    :param config: app configuration with prefix and postfix of the meteogram files
+    :param path: path to the data
+    :return: dictionary mapping the date as YYYY-MM-DD to the path of the file, sorted by date
+    """
+    prefix = config['paths']['prefix_meteogram']
+    postfix = config['paths']['postfix_meteogram'] + '.nc'
+    files = {}
+    for filename in glob.glob(os.path.join(glob.escape(path), prefix + '*' + postfix)):
+        seldate = meteogram_date(config, filename)
+        # some other file that happens to match the pattern is skipped
+        if seldate is not None:
+            files[seldate] = filename
+    return dict(sorted(files.items()))
+
+
+def meteogram_date(config : dict, filename : str):
+    """ Get the date of a meteogram file from its name
+
+    :param config: app configuration with prefix and postfix of the meteogram files
+    :param filename: path to the meteogram file
+    :return: date as YYYY-MM-DD or None if the name is not the one of a meteogram file
+    """
+    prefix = config['paths']['prefix_meteogram']
+    postfix = config['paths']['postfix_meteogram'] + '.nc'
+    name = os.path.basename(filename)
+    if not name.startswith(prefix) or not name.endswith(postfix):
+        return None
+    try:
+        return datetime.strptime(name[len(prefix):-len(postfix)], '%Y%m%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .catalog import get_catalog
+from .dataset_cache import meteogram_path
+from .lod import lod_config
+
+
+def range_config(config : dict) -> dict:
+    """ Return the date range settings with defaults filled in
+
+    :param config: app configuration, the settings are read from the [range] table
+    :return: dictionary with the longest allowed range and the number of worker processes
+    """
+    date_range = config.get('range', {})
+    return {'max_days': date_range.get('max_days', 31),
+            'workers': date_range.get('workers', 0) or os.cpu_count() or 1}
+
+
+def ignores_trigger(triggered_id : str, date_mode : str) -> bool:
+    """ Check if a data callback was triggered by the date picker that is not in use
+
+    :param triggered_id: id of the component that triggered the callback
+    :param date_mode: 'single' or 'range'
+    :return: True if the callback should not update
+    """
+    return (triggered_id == 'datepicker' and date_mode == 'range') or \
+        (triggered_id == 'daterange' and date_mode != 'range')
+
+
+def selected_files(config : dict, path : str, seldate : str, date_mode : str,
+                   start_date : str, end_date : str, window=None) -> list:
+    """ Meteogram files shown for the selected date or date range
+
+    :param config: app configuration
+    :param path: path to the data
+    :param seldate: date of the single day picker as YYYY-MM-DD
+    :param date_mode: 'single' or 'range'
+    :param start_date: first date of the range as YYYY-MM-DD
+    :param end_date: last date of the range as YYYY-MM-DD
+    :param window: optional zoomed time window, days outside of it are skipped
+    :return: list of paths of the days that have a file
+    """
+    catalog = get_catalog(config, path)
+    if date_mode != 'range':
+        # a date without a file shows the error figure instead of failing to open it
+        filename = meteogram_path(config, path, seldate)
+        return [filename] if catalog.entry(filename) is not None else []
+    if not start_date or not end_date:
+        return []
+    first, last = start_date[:10], end_date[:10]
+    if window is not None:
+        first = max(first, str(pd.Timestamp(window[0]).date()))
+        last = min(last, str(pd.Timestamp(window[1]).date()))
+    files = [filename for day, filename in catalog.files().items() if first <= day <= last]
+    return files[:range_config(config)['max_days']]
+
+
+_pool = None
+
+
+def get_range_pool(config : dict) -> ProcessPoolExecutor:
+    """ Return the process pool loading the days of a range, creating it on first use
+
+    :param config: app configuration, the number of processes is read from the [range] table
+    :return: shared ProcessPoolExecutor
+    """
+    global _pool
+    if _pool is None:
+        # the server has other threads running, a forked worker could inherit a lock they hold,
+        # e.g. of the dataset cache, and block forever; forkserver workers start from a clean process
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        _pool = ProcessPoolExecutor(max_workers=range_config(config)['workers'], mp_context=context)
+    return _pool
+
+
+def load_files(config : dict, loader, files : list, window=None):
+    """ Load one or several days with a data function of a panel
+
+    Every day is read and reduced by a worker process with its share of the point budget,
+    so only the downsampled days are sent back and concatenated. The work is spread over a
+    bounded number of processes, i.e. it scales with the number of cores, not of files, and
+    every process keeps at most the last day it read open.
+
+    :param config: app configuration
+    :param loader: module level data function, e.g. load_timeheight
+    :param files: paths of the meteogram files in temporal order
+    :param window: optional time window that is read at full resolution
+    :return: gridded data of all days or None if there are no files
+    """
+    if not files:
+        return None
+    if len(files) == 1:
+        return loader(config, files[0], window)
+
+    # each day gets an equal share of the point budget of the graph
+    lod = lod_config(config)
+    day_config = dict(config, lod=dict(lod, max_points_1d=max(lod['max_points_1d'] // len(files), 2),
+                                       max_points_2d=max(lod['max_points_2d'] // len(files), 1)),
+                      # the dataset cache of a worker holds a single day, with the budget of the
+                      # [cache] table per worker the loaded variables of up to max_entries days
+                      # would stay in the memory of every one of them
+                      cache=dict(config.get('cache', {}), max_entries=1))
+    pool = get_range_pool(config)
+    grids = list(pool.map(loader, [day_config] * len(files), files, [window] * len(files)))
+    return concat_grids(grids)
+
+
+def concat_grids(grids : list) -> dict:
+    """ Concatenate the gridded data of consecutive days along time
+
+    :param grids: gridded data as returned by the data functions of the panels
+    :return: gridded data with only the variables that exist on every day
+    """
+    names = [name for name in grids[0]['data'] if all(name in grid['data'] for grid in grids)]
+    if 'time' not in grids[0]:
+        # 1-D panels keep a time axis per series
+        return {'data': {name: {'time': np.concatenate([grid['data'][name]['time'] for grid in grids]),
+                                'values': np.concatenate([grid['data'][name]['values'] for grid in grids])}
+                         for name in names},
+                'end': grids[-1]['end']}
+    # 2-D panels share the time axis, the levels are the same on every day
+    return {'time': np.concatenate([grid['time'] for grid in grids]), 'height_2': grids[0]['height_2'],
+            'data': {name: np.concatenate([grid['data'][name] for grid in grids]) for name in names},
+            'end': grids[-1]['end']}
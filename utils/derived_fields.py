@@ -0,0 +1,78 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import xarray as xr
+
+# hydrometeor species that are added up to the total mass and total number concentration
+MASS_SPECIES = ['QV', 'QC', 'QI', 'QR', 'QS', 'QG', 'QH']
+NUMBER_SPECIES = ['QNC', 'QNI', 'QNR', 'QNS', 'QNG', 'QNH']
+# fields that are shown as log10, the number concentrations of the single species stay linear
+LOG_FIELDS = MASS_SPECIES + ['total mass', 'total number']
+
+
+def add_precip_fields(ds : 'xr.Dataset') -> 'xr.Dataset':
+    """ Add snow, rain and total precipitation if they are not already in the dataset
+
+    :param ds: meteogram dataset with grid scale and convective rain and snow
+    :return: dataset with SNOW, RAIN and PRECIP
+    """
+    if all(var in ds for var in ['SNOW', 'RAIN', 'PRECIP']):
+        return ds
+    ds = ds.copy()
+    ds['SNOW'] = ds.SNOW_GSP + ds.SNOW_CON
+    ds['RAIN'] = ds.RAIN_GSP + ds.RAIN_CON
+    ds['PRECIP'] = ds['SNOW'] + ds['RAIN']
+    return ds
+
+
+def add_hydrometeor_totals(ds : 'xr.Dataset') -> 'xr.Dataset':
+    """ Add the total hydrometeor mass and number concentration if they are not already
+    in the dataset. Only the species that exist in the dataset are added up.
+
+    :param ds: meteogram dataset
+    :return: dataset with 'total mass' and 'total number' where species are available
+    """
+    ds = ds.copy()
+    for total, species in [('total mass', MASS_SPECIES), ('total number', NUMBER_SPECIES)]:
+        present = [var for var in species if var in ds]
+        if total not in ds and present:
+            ds[total] = sum(ds[var] for var in present)
+    return ds
+
+
+def transform_hydrometeors(names : list, stack : np.ndarray, threshold : float = 1e-8, fill : float = -9) -> dict:
+    """ Add the totals and convert the mass fields to log10 in one vectorized pass over
+    all species. Totals that are already in names, e.g. from a sidecar, are not recomputed.
+
+    :param names: names of the species along the first axis of stack
+    :param stack: array of shape (species, time, height)
+    :param threshold: values below this are replaced by fill instead of taking the log
+    :param fill: value used for amounts below the threshold
+    :return: dictionary with a (time, height) array per species and total
+    """
+    names = list(names)
+    totals = [(total, [names.index(var) for var in species if var in names])
+              for total, species in [('total mass', MASS_SPECIES), ('total number', NUMBER_SPECIES)]]
+    totals = [(total, idx) for total, idx in totals if total not in names and idx]
+
+    # the output holds all fields that are shown as log10 first, so that they form one block
+    log_names = [name for name in names if name in LOG_FIELDS] + [total for total, _ in totals]
+    out_names = log_names + [name for name in names if name not in LOG_FIELDS]
+    out = np.empty((len(out_names),) + stack.shape[1:])
+    for i, name in enumerate(out_names):
+        if name in names:
+            out[i] = stack[names.index(name)]
+    for total, idx in totals:
+        np.sum(stack[idx], axis=0, out=out[out_names.index(total)])
+
+    # the mask and the log are evaluated once for the whole block, missing values stay NaN
+    logged = out[:len(log_names)]
+    low = logged < threshold
+    np.maximum(logged, threshold, out=logged)
+    np.log10(logged, out=logged)
+    # move the clipped values from log10(threshold) to fill, arithmetic is much faster
+    # than a masked assignment with a scattered mask
+    logged += low * (fill - np.log10(threshold))
+    return dict(zip(out_names, out))
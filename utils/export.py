@@ -0,0 +1,140 @@
+import importlib.util
+import json
+import os
+
+from callbacks.vars1d_callbacks import load_vars1d, build_vars1d_figure
+from callbacks.precip_callbacks import load_precip, build_precip_figure
+from callbacks.time_height_callbacks import load_timeheight, build_timeheight_figure
+from callbacks.hydrometeors_callbacks import load_hydrometeors, build_hydrometeors_figure
+from .sidecar import preferred_source
+from .variables import VARS_1D, VARS_TIMEHEIGHT, VARS_HYDROMETEORS
+
+# name of the file listing the outputs of a day, written after all figures of the day
+MANIFEST = 'manifest.json'
+
+
+def export_config(config : dict) -> dict:
+    """ Return the export settings with defaults filled in
+
+    :param config: app configuration, the settings are read from the [export] table
+    :return: dictionary with the output directory, formats, image size and level range
+    """
+    export = config.get('export', {})
+    maxlev = config.get('data.meteogram', {}).get('maxlev_idx', 150)
+    return {'directory': export.get('directory', './quicklooks'),
+            'formats': export.get('formats', ['png']),
+            'width': export.get('width', 1000),
+            'height': export.get('height', 500),
+            # the default selection of the level slider of the dashboard
+            'level_range': export.get('level_range', [50, maxlev])}
+
+
+def check_formats(formats : list):
+    """ Check that the requested formats can be written on this machine
+
+    :param formats: list of 'png', 'svg', 'pdf' and 'html'
+    :raise ValueError: if an image format is requested and kaleido is not installed
+    """
+    if any(fmt != 'html' for fmt in formats) and importlib.util.find_spec('kaleido') is None:
+        raise ValueError('writing {} requires the kaleido package, install it or export html only'.format(
+            ', '.join(fmt for fmt in formats if fmt != 'html')))
+
+
+def day_figures(config : dict, filename : str, level_range : list):
+    """ Build the figures of every panel and variable of a day
+
+    :param config: app configuration
+    :param filename: path to the meteogram file
+    :param level_range: range of level indices of the time-height and hydrometeor plots
+    :return: generator of the output name, the title and the plotly figure
+    """
+    grid = load_vars1d(config, filename)
+    for var, label in VARS_1D.items():
+        if var in grid['data']:
+            yield 'vars1d_' + var, label, build_vars1d_figure(grid, var)
+    yield 'precip', 'Precipitation', build_precip_figure(load_precip(config, filename))
+    grid = load_timeheight(config, filename)
+    for var, label in VARS_TIMEHEIGHT.items():
+        if var in grid['data']:
+            yield 'timeheight_' + var, label, build_timeheight_figure(grid, var, level_range)
+    grid = load_hydrometeors(config, filename)
+    for var, label in VARS_HYDROMETEORS.items():
+        if var in grid['data']:
+            # spaces of the derived totals are not used in file names
+            yield 'hydrometeors_' + var.replace(' ', '_'), label, build_hydrometeors_figure(grid, var, level_range)
+
+
+def is_exported(directory : str, filename : str, source : str, formats : list) -> bool:
+    """ Check if the outputs of a day exist and are newer than its meteogram file
+
+    :param directory: output directory of the day
+    :param filename: path to the meteogram file
+    :param source: file the data is read from, the meteogram file or its sidecar
+    :param formats: formats that are requested
+    :return: True if the day does not have to be exported again
+    """
+    manifest = os.path.join(directory, MANIFEST)
+    if not os.path.exists(manifest):
+        return False
+    newest_input = max(os.path.getmtime(filename), os.path.getmtime(source))
+    if os.path.getmtime(manifest) <= newest_input:
+        return False
+    with open(manifest) as fp:
+        exported = json.load(fp)
+    return exported['formats'] == formats and \
+        all(os.path.exists(os.path.join(directory, name)) for name in exported['outputs'])
+
+
+def export_day(config : dict, filename : str, seldate : str, force : bool = False) -> bool:
+    """ Write the figures of every panel of a day to image or html files
+
+    The files of a day are written to a directory named after the date. The html files
+    share a single copy of plotly.js in the output directory, so they open offline.
+
+    :param config: app configuration
+    :param filename: path to the meteogram file
+    :param seldate: date of the file as YYYY-MM-DD
+    :param force: export the day even if its outputs are up to date
+    :return: True if the figures were written, False if they were up to date
+    """
+    settings = export_config(config)
+    directory = os.path.join(settings['directory'], seldate)
+    source, _ = preferred_source(config, filename)
+    if not force and is_exported(directory, filename, source, settings['formats']):
+        return False
+    os.makedirs(directory, exist_ok=True)
+
+    outputs = []
+    for name, label, fig in day_figures(config, filename, settings['level_range']):
+        # the dashboard draws on its dark page, a file needs its own background and a title
+        fig.update_layout(title={'text': '{} {}'.format(label, seldate), 'x': 0.5, 'xanchor': 'center'},
+                          paper_bgcolor=config.get('style', {}).get('bg_color', '#005176'),
+                          width=settings['width'], height=settings['height'])
+        for fmt in settings['formats']:
+            output = '{}.{}'.format(name, fmt)
+            if fmt == 'html':
+                # plotly.js is written once next to the date directories instead of into every file
+                _write_plotlyjs(settings['directory'])
+                fig.write_html(os.path.join(directory, output), include_plotlyjs='../plotly.min.js')
+            else:
+                fig.write_image(os.path.join(directory, output), format=fmt)
+            outputs.append(output)
+
+    # the manifest is written last, an interrupted day is exported again on the next run
+    with open(os.path.join(directory, MANIFEST), 'w') as fp:
+        json.dump({'source': filename, 'formats': settings['formats'], 'outputs': outputs}, fp, indent=1)
+    return True
+
+
+def _write_plotlyjs(root : str):
+    """ Write plotly.js once into the output directory, the html files refer to it """
+    path = os.path.join(root, 'plotly.min.js')
+    if os.path.exists(path):
+        return
+    from plotly.offline import get_plotlyjs
+
+    # several processes may export at the same time, the file is replaced atomically
+    tmpname = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmpname, 'w', encoding='utf-8') as fp:
+        fp.write(get_plotlyjs())
+    os.replace(tmpname, path)
@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .metrics import count
+from .result_store import load_result, result_id, binary_dtype, binary_transport, server_side
+from .binary import typed_figure
+from .live import get_live_tails, with_tail
+
+
+class FigureCache:
+    """ Least recently used cache of built figures.
+
+    Figures are stored as the dictionaries that are sent to the browser, so a cached
+    figure is returned without decoding the data and without applying the styling again.
+    """
+
+    def __init__(self, max_entries : int = 128, max_memory_mb : float = 256):
+        """
+        :param max_entries: maximum number of figures kept
+        :param max_memory_mb: maximum size of the data of all cached figures in MB
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_memory_mb * 1024**2
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key : tuple):
+        """ Return the figure stored under key
+
+        :param key: key of the figure
+        :return: figure dictionary or None if it is not cached
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key : tuple, figure : dict):
+        """ Store a figure, evicting the least recently used figures if the cache is full
+
+        :param key: key of the figure
+        :param figure: figure dictionary
+        """
+        size = figure_nbytes(figure)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (figure, size)
+            self.nbytes += size
+            # the most recently added figure is always kept
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                              or self.nbytes > self.max_bytes):
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+    def discard(self, source : str):
+        """ Remove the figures built from a result
+
+        :param source: key of the result
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == source]:
+                self.nbytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """ Remove all figures """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+def figure_nbytes(value) -> int:
+    """ Estimate the memory used by the data of a figure
+
+    :param value: figure dictionary or a part of it
+    :return: size in bytes of the arrays, lists and strings it contains
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, str):
+        # arrays encoded as base64 by plotly
+        return len(value)
+    if isinstance(value, dict):
+        return sum(figure_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return 8 * len(value) + sum(figure_nbytes(item) for item in value if isinstance(item, (dict, list, tuple)))
+    return 0
+
+
+_cache = None
+
+
+def get_figure_cache(config : dict):
+    """ Return the figure cache shared by all callbacks, creating it on first use
+
+    :param config: app configuration, the cache is configured in the [figures] table
+    :return: shared FigureCache or None if figures are not cached
+    """
+    global _cache
+    figures_config = config.get('figures', {})
+    if not figures_config.get('enabled', True):
+        return None
+    if _cache is None:
+        _cache = FigureCache(max_entries=figures_config.get('max_entries', 128),
+                             max_memory_mb=figures_config.get('max_memory_mb', 256))
+    return _cache
+
+
+def clientside_figures(config : dict) -> bool:
+    """ Check if a graph is redrawn in the browser when only the selected variable changes
+
+    :param config: app configuration
+    :return: True if [figures] clientside is set and the results are sent to the browser,
+        in server mode the browser only has the keys of the results
+    """
+    return config.get('figures', {}).get('clientside', True) and not server_side(config)
+
+
+def typed_figures(config : dict) -> bool:
+    """ Check if the figures are sent to the browser as base64 typed arrays
+
+    :param config: app configuration
+    :return: [figures] typed_arrays, by default True in the binary store mode
+    """
+    return config.get('figures', {}).get('typed_arrays', binary_transport(config))
+
+
+def cached_figure(config : dict, data, build, *params):
+    """ Build the figure of a graph callback or return it from the figure cache
+
+    The key of the data callback result identifies the files, the time window and the
+    decimation, together with the steps the live mode appended to the result and params
+    it identifies the figure.
+
+    :param config: app configuration
+    :param data: content of the intermediate dcc.Store
+    :param build: function building the figure from the gridded data and params
+    :param params: further inputs of the figure, e.g. the variable and the level range
+    :return: figure dictionary, or the error figure returned by build if there is no data
+    """
+    cache = get_figure_cache(config)
+    source = result_id(data)
+    tail = get_live_tails(config).get(source) if source is not None else None
+    key = None
+    if cache is not None and source is not None:
+        key = (source, tail['end'] if tail is not None else None) + \
+            tuple(tuple(param) if isinstance(param, list) else param for param in params)
+        figure = cache.get(key)
+        if figure is not None:
+            count('figure_cache_hits')
+            return figure
+
+    result = load_result(config, data)
+    grid = with_tail(result, tail)
+    figure = build(grid, *params)
+    if grid is None:
+        # the error figure is not cached, the result may be computed again later
+        return figure
+    if 'end' in grid:
+        # the last time step the figure is built from, the live mode appends the steps after it
+        figure.update_layout(meta={'end': str(np.datetime_as_string(grid['end'], unit='ns')),
+                                   'appended': grid is not result})
+    figure = figure.to_dict()
+    if typed_figures(config):
+        figure = typed_figure(figure, binary_dtype(config))
+    if key is not None:
+        cache.put(key, figure)
+    return figure
@@ -0,0 +1,164 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .dataset_cache import get_dataset_cache
+from .date_range import concat_grids
+from .lod import lod_config, decimation_factor
+from .result_store import result_id, result_window
+
+
+def live_config(config : dict) -> dict:
+    """ Return the live mode settings with defaults filled in
+
+    :param config: app configuration, the settings are read from the [live] table
+    :return: dictionary with the polling interval and the number of results whose appended steps are kept
+    """
+    live = config.get('live', {})
+    return {'interval_seconds': live.get('interval_seconds', 60),
+            'max_tails': live.get('max_tails', 16)}
+
+
+def figure_end(figure):
+    """ Last time step of the data a figure was built from
+
+    :param figure: plotly figure or figure dictionary
+    :return: time as string or None for the error figure
+    """
+    if isinstance(figure, dict):
+        meta = figure.get('layout', {}).get('meta')
+    else:
+        meta = figure['layout']['meta']
+    return (meta or {}).get('end')
+
+
+def live_position(data, figure):
+    """ Content of the live store of a graph, where the live mode continues it
+
+    :param data: content of the intermediate dcc.Store the figure was built from
+    :param figure: figure dictionary built by cached_figure
+    :return: dictionary with the key of the result, the last time step of the figure and if
+        steps of the live mode were added to it, or None if the live mode leaves the graph
+        alone: it shows the error figure or a zoomed time window
+    """
+    end = figure_end(figure)
+    if end is None or result_window(data) is not None:
+        return None
+    return {'key': result_id(data), 'end': end, 'appended': figure['layout']['meta'].get('appended', False)}
+
+
+class LiveTails:
+    """ Time steps the live mode appended to the results of the data callbacks.
+
+    A result is never changed, its key identifies the files as they were read. The steps
+    read by the polls are kept here per result instead and added whenever a figure is built
+    from it, so a redraw of a graph keeps them and the next poll only reads the steps after them.
+    """
+
+    def __init__(self, max_entries : int = 16):
+        """
+        :param max_entries: maximum number of results whose appended steps are kept
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key : str):
+        """ Return the steps appended to a result
+
+        :param key: key of the result
+        :return: dictionary with the gridded data of the steps and its first and last time
+            step as 'grid', 'start' and 'end', or None
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def append(self, key : str, since : str, grid : dict):
+        """ Add steps read by a poll
+
+        :param key: key of the result the graph was drawn from
+        :param since: last time step of the graph before the steps
+        :param grid: gridded data of the steps after since
+        """
+        since = np.datetime64(since, 'ns')
+        with self._lock:
+            entry = self._entries.get(key)
+            # the entries are replaced and not changed, a figure may be built from one meanwhile
+            if entry is not None and entry['end'] == since:
+                entry = {'start': entry['start'], 'grid': concat_grids([entry['grid'], grid])}
+            else:
+                # the graph was drawn without the steps kept so far, they were read again after since
+                entry = {'start': since, 'grid': grid}
+            entry['end'] = np.datetime64(grid['end'][()], 'ns')
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def with_tail(grid, tail):
+    """ Add the steps the live mode appended to a result
+
+    :param grid: gridded data of the result or None
+    :param tail: appended steps as returned by LiveTails.get or None
+    :return: gridded data with the steps, or grid if they do not continue it
+    """
+    if grid is None or tail is None or np.datetime64(grid['end'][()], 'ns') != tail['start']:
+        return grid
+    return concat_grids([grid, tail['grid']])
+
+
+_tails = None
+
+
+def get_live_tails(config : dict) -> LiveTails:
+    """ Return the appended steps shared by all callbacks, creating them on first use
+
+    :param config: app configuration, the number of results is read from the [live] table
+    :return: shared LiveTails
+    """
+    global _tails
+    if _tails is None:
+        _tails = LiveTails(max_entries=live_config(config)['max_tails'])
+    return _tails
+
+
+def read_tail(config : dict, loader, filename : str, since : str, two_d : bool = False):
+    """ Read the time steps that were appended to a meteogram file after since
+
+    The new steps are reduced with the decimation a full read of the file would use now,
+    only complete blocks of steps are read, the rest is read by a later call.
+
+    :param config: app configuration
+    :param loader: data function of the panel, e.g. load_timeheight
+    :param filename: path to the meteogram file
+    :param since: last time step that is already shown
+    :param two_d: True for the time-height panels, False for the line plots
+    :return: gridded data of the new steps or None if there are no new complete blocks
+    """
+    # the cache opens the file again if it was written since the last call,
+    # only the metadata is read until the window of new steps is selected
+    ds = get_dataset_cache(config).get(filename)
+    time = ds.time.values
+    lod = lod_config(config)
+    n_other = ds.sizes['height_2'] if two_d else 1
+    if two_d:
+        factor = decimation_factor(len(time), n_other, lod['max_points_2d'])
+    elif len(time) > lod['max_points_1d']:
+        # the block length of minmax_downsample
+        factor = math.ceil(len(time) / max(lod['max_points_1d'] // 2, 1))
+    else:
+        factor = 1
+
+    start = np.searchsorted(time, np.datetime64(since), side='right')
+    n_blocks = (len(time) - start) // factor
+    if n_blocks == 0:
+        return None
+    # budgets that make the data function reduce the new steps by exactly factor
+    tail_config = dict(config, lod=dict(lod, max_points_1d=2 * n_blocks, max_points_2d=n_blocks * n_other))
+    return loader(tail_config, filename, (time[start], time[start + n_blocks * factor - 1]))
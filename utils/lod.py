@@ -0,0 +1,165 @@
+import math
+import warnings
+
+import numpy as np
+# pandas is imported with the app and not on first use: plotly checks for an already imported
+# pandas when it serializes a response, and would see it half imported by another thread
+import pandas as pd
+
+
+def lod_config(config : dict) -> dict:
+    """ Return the level of detail settings with defaults filled in
+
+    :param config: app configuration, the settings are read from the [lod] table
+    :return: dictionary with the point budgets and the reduction used for 2-D fields
+    """
+    lod = config.get('lod', {})
+    return {'max_points_1d': lod.get('max_points_1d', 2000),
+            'max_points_2d': lod.get('max_points_2d', 30000),
+            'reduce_2d': lod.get('reduce_2d', 'mean')}
+
+
+def changes_time_axis(relayout_data : dict) -> bool:
+    """ Check if a relayoutData event zoomed or reset the time axis
+
+    :param relayout_data: relayoutData of a dcc.Graph
+    :return: True if the x axis range was changed
+    """
+    if not relayout_data:
+        return False
+    return any(key.startswith('xaxis.range') or key == 'xaxis.autorange' for key in relayout_data)
+
+
+def time_window(relayout_data : dict):
+    """ Get the visible time range from a relayoutData event
+
+    :param relayout_data: relayoutData of a dcc.Graph
+    :return: tuple of start and end as numpy datetime64 or None if the full range is shown
+    """
+    if not relayout_data or relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        start, end = relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    elif 'xaxis.range' in relayout_data:
+        start, end = relayout_data['xaxis.range']
+    else:
+        return None
+    # always in ns, the window is part of the result keys and must not depend on the string precision
+    return np.datetime64(pd.Timestamp(start), 'ns'), np.datetime64(pd.Timestamp(end), 'ns')
+
+
+def decimation_factor(n_time : int, n_other : int, max_points : int) -> int:
+    """ Number of time steps that are combined so that a field stays within a point budget
+
+    :param n_time: number of time steps
+    :param n_other: number of points per time step, e.g. the number of levels
+    :param max_points: point budget of the graph
+    :return: block length along time, 1 if no decimation is needed
+    """
+    return max(1, math.ceil(n_time * max(n_other, 1) / max_points))
+
+
+def block_times(time : np.ndarray, factor : int) -> np.ndarray:
+    """ Centre times of consecutive blocks of factor time steps
+
+    :param time: datetime64 time axis
+    :param factor: block length
+    :return: time axis of the reduced data
+    """
+    if factor <= 1:
+        return time
+    starts = time[::factor]
+    ends = time[np.minimum(np.arange(factor - 1, len(time) + factor - 1, factor), len(time) - 1)]
+    return starts + (ends - starts) / 2
+
+
+def block_reduce(values : np.ndarray, factor : int, how : str = 'mean', axis : int = 0) -> np.ndarray:
+    """ Reduce consecutive blocks of factor time steps along the time axis
+
+    :param values: array with a time axis
+    :param factor: block length, the last block may be shorter
+    :param how: 'mean' or 'max'
+    :param axis: position of the time axis
+    :return: reduced array
+    """
+    if factor <= 1:
+        return values
+    if axis != 0:
+        return np.moveaxis(block_reduce(np.moveaxis(values, axis, 0), factor, how), 0, axis)
+    values = np.asarray(values, dtype=float)
+    pad = (-values.shape[0]) % factor
+    if pad:
+        values = np.concatenate([values, np.full((pad,) + values.shape[1:], np.nan)])
+    blocks = values.reshape((-1, factor) + values.shape[1:])
+    # blocks that only contain missing values stay NaN without a warning
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        if how == 'max':
+            return np.nanmax(blocks, axis=1)
+        return np.nanmean(blocks, axis=1)
+
+
+def reduce_blocks(da, factor : int, how : str = 'mean') -> np.ndarray:
+    """ Reduce consecutive blocks of factor time steps of a data array and load the result.
+    Data sets opened with chunks are reduced lazily chunk by chunk by dask, so only
+    the reduced field is ever held in memory.
+
+    :param da: xarray data array with a time dimension
+    :param factor: block length, the last block may be shorter
+    :param how: 'mean' or 'max'
+    :return: reduced values as numpy array
+    """
+    if da.chunks is None:
+        return block_reduce(da.values, factor, how, axis=da.get_axis_num('time'))
+    if factor <= 1:
+        return da.values
+    blocks = da.coarsen(time=factor, boundary='pad')
+    return (blocks.max() if how == 'max' else blocks.mean()).values
+
+
+def minmax_downsample(time : np.ndarray, values : np.ndarray, max_points : int):
+    """ Downsample a time series while keeping the minimum and maximum of each block,
+    so that peaks stay visible in the line plot
+
+    :param time: datetime64 time axis
+    :param values: 1-D values
+    :param max_points: maximum number of points returned
+    :return: tuple of the selected times and values
+    """
+    n = len(values)
+    if n <= max_points:
+        return time, values
+    factor = math.ceil(n / max(max_points // 2, 1))
+    pad = (-n) % factor
+    filled = np.asarray(values, dtype=float)
+    lows = np.concatenate([np.where(np.isnan(filled), np.inf, filled), np.full(pad, np.inf)])
+    highs = np.concatenate([np.where(np.isnan(filled), -np.inf, filled), np.full(pad, -np.inf)])
+    starts = np.arange(0, n, factor)
+    imin = starts + lows.reshape(-1, factor).argmin(axis=1)
+    imax = starts + highs.reshape(-1, factor).argmax(axis=1)
+    # np.unique also sorts, so the selected points stay in temporal order
+    idx = np.unique(np.minimum(np.concatenate([imin, imax]), n - 1))
+    return time[idx], values[idx]
+
+
+def last_time(time : np.ndarray) -> np.ndarray:
+    """ Last time step that was read, before any decimation
+
+    :param time: datetime64 time axis
+    :return: 0-d datetime64 array, NaT if no time step was read
+    """
+    if len(time) == 0:
+        return np.asarray(np.datetime64('NaT', 'ns'))
+    return np.asarray(time[-1])
+
+
+def select_window(ds, window):
+    """ Restrict a data set to a time window
+
+    :param ds: xarray dataset or data array with a time dimension
+    :param window: tuple of start and end or None for the full range
+    :return: selected data
+    """
+    if window is None:
+        return ds
+    return ds.sel(time=slice(window[0], window[1]))
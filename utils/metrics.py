@@ -0,0 +1,221 @@
+import functools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import flask
+from dash.exceptions import PreventUpdate
+
+logger = logging.getLogger(__name__)
+
+PHASES = ['open', 'transform', 'serialize']
+
+# record of the callback that is running in the current thread, None if it is not instrumented
+_local = threading.local()
+
+
+def metrics_config(config : dict) -> dict:
+    """ Return the instrumentation settings with defaults filled in
+
+    :param config: app configuration, the settings are read from the [metrics] table
+    :return: dictionary with the switch, the route of the endpoint and the slow call threshold
+    """
+    metrics = config.get('metrics', {})
+    return {'enabled': metrics.get('enabled', False),
+            'route': metrics.get('route', '/metrics'),
+            'format': metrics.get('format', 'prometheus'),
+            'slow_ms': metrics.get('slow_ms', 0)}
+
+
+@contextmanager
+def timed(phase : str):
+    """ Add the time spent in the block to a phase of the running callback.
+    Outside of an instrumented callback this does nothing.
+
+    :param phase: 'open' or 'serialize', the remaining time of a callback is counted as 'transform'
+    """
+    record = getattr(_local, 'record', None)
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record['phases'][phase] += time.perf_counter() - start
+
+
+def count(event : str, n : int = 1):
+    """ Count an event, e.g. a cache hit, for the running callback.
+    Outside of an instrumented callback this does nothing.
+
+    :param event: name of the event
+    :param n: increment
+    """
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record['events'][event] += n
+
+
+class CallbackMetrics:
+    """ Thread safe totals of the timings, payload sizes and cache hits of each callback.
+
+    Dash serializes the return value of a callback after the callback returned, so for
+    calls that are handled in a request the record is finished in an after_request hook,
+    which adds the time of the serialization and the size of the response.
+    """
+
+    def __init__(self, slow_ms : float = 0):
+        """
+        :param slow_ms: calls that take longer are logged as warning, 0 to disable
+        """
+        self.slow_ms = slow_ms
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, name : str, func):
+        """ Instrument a callback function
+
+        :param name: name the callback is reported under
+        :param func: callback function
+        :return: wrapped function
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            record = {'phases': defaultdict(float), 'events': defaultdict(int),
+                      'status': 'ok', 'payload_bytes': 0}
+            _local.record = record
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except PreventUpdate:
+                record['status'] = 'prevented'
+                raise
+            except Exception:
+                record['status'] = 'error'
+                raise
+            finally:
+                _local.record = None
+                record['end'] = time.perf_counter()
+                record['seconds'] = record['end'] - start
+                phases = record['phases']
+                phases['transform'] = max(record['seconds'] - phases['open'] - phases['serialize'], 0)
+                if flask.has_request_context():
+                    flask.g.callback_record = (name, record)
+                else:
+                    self.add(name, record)
+        return wrapper
+
+    def finish_request(self, response):
+        """ after_request hook, adds the serialization of the response to the record
+        of the callback that handled the request
+
+        :param response: flask response
+        :return: the unchanged response
+        """
+        name, record = flask.g.pop('callback_record', (None, None))
+        if record is not None:
+            response_seconds = time.perf_counter() - record['end']
+            record['phases']['serialize'] += response_seconds
+            record['seconds'] += response_seconds
+            if not response.is_streamed:
+                record['payload_bytes'] = response.calculate_content_length() or 0
+            self.add(name, record)
+        return response
+
+    def add(self, name : str, record : dict):
+        """ Add a finished call to the totals of a callback
+
+        :param name: name of the callback
+        :param record: record created by the wrapper
+        """
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                'calls': 0, 'errors': 0, 'prevented': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                'payload_bytes': 0, 'phases': {phase: 0.0 for phase in PHASES}, 'events': {}})
+            stats['calls'] += 1
+            if record['status'] == 'error':
+                stats['errors'] += 1
+            elif record['status'] == 'prevented':
+                stats['prevented'] += 1
+            stats['seconds'] += record['seconds']
+            stats['max_seconds'] = max(stats['max_seconds'], record['seconds'])
+            stats['payload_bytes'] += record['payload_bytes']
+            for phase, seconds in record['phases'].items():
+                stats['phases'][phase] = stats['phases'].get(phase, 0.0) + seconds
+            for event, n in record['events'].items():
+                stats['events'][event] = stats['events'].get(event, 0) + n
+
+        if self.slow_ms and record['seconds'] * 1000 > self.slow_ms:
+            logger.warning('slow callback %s: %.0f ms (%s), %d bytes, %s', name, record['seconds'] * 1000,
+                           ', '.join('{} {:.0f} ms'.format(phase, record['phases'][phase] * 1000) for phase in PHASES),
+                           record['payload_bytes'], dict(record['events']) or 'no cache hits')
+
+    def snapshot(self) -> dict:
+        """ Return a copy of the totals of all callbacks """
+        with self._lock:
+            return json.loads(json.dumps(self._stats))
+
+    def prometheus(self) -> str:
+        """ Format the totals in the Prometheus text exposition format """
+        stats = self.snapshot()
+        metrics = [
+            ('calls_total', 'counter', 'Number of calls', lambda s: s['calls']),
+            ('errors_total', 'counter', 'Number of calls that raised an error', lambda s: s['errors']),
+            ('prevented_total', 'counter', 'Number of calls that prevented the update', lambda s: s['prevented']),
+            ('seconds_total', 'counter', 'Wall time of all calls', lambda s: s['seconds']),
+            ('seconds_max', 'gauge', 'Wall time of the slowest call', lambda s: s['max_seconds']),
+            ('payload_bytes_total', 'counter', 'Size of all responses', lambda s: s['payload_bytes']),
+        ]
+        lines = []
+        for suffix, kind, description, value in metrics:
+            lines += ['# HELP dashboard_callback_{} {}'.format(suffix, description),
+                      '# TYPE dashboard_callback_{} {}'.format(suffix, kind)]
+            lines += ['dashboard_callback_{}{{callback="{}"}} {}'.format(suffix, name, value(s))
+                      for name, s in stats.items()]
+        lines += ['# HELP dashboard_callback_phase_seconds_total Wall time per phase of all calls',
+                  '# TYPE dashboard_callback_phase_seconds_total counter']
+        lines += ['dashboard_callback_phase_seconds_total{{callback="{}",phase="{}"}} {}'.format(name, phase, seconds)
+                  for name, s in stats.items() for phase, seconds in s['phases'].items()]
+        lines += ['# HELP dashboard_callback_events_total Cache hits and misses of all calls',
+                  '# TYPE dashboard_callback_events_total counter']
+        lines += ['dashboard_callback_events_total{{callback="{}",event="{}"}} {}'.format(name, event, n)
+                  for name, s in stats.items() for event, n in s['events'].items()]
+        return '\n'.join(lines) + '\n'
+
+
+def instrument_app(app, config : dict):
+    """ Instrument all callbacks that are registered afterwards and add the metrics endpoint
+    to the flask server of the app. Does nothing unless enabled in the [metrics] table.
+
+    :param app: dash app, must be called before the get_callbacks_* functions
+    :param config: app configuration
+    :return: CallbackMetrics or None if the instrumentation is disabled
+    """
+    settings = metrics_config(config)
+    if not settings['enabled']:
+        return None
+    metrics = CallbackMetrics(slow_ms=settings['slow_ms'])
+
+    register = app.callback
+
+    def callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+
+        def decorate(func):
+            return decorator(metrics.wrap(func.__name__, func))
+        return decorate
+    app.callback = callback
+
+    def metrics_view():
+        # ?format=json or ?format=prometheus overrides the configured format
+        if flask.request.args.get('format', settings['format']) == 'json':
+            return flask.jsonify(metrics.snapshot())
+        return flask.Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+    app.server.add_url_rule(settings['route'], 'metrics', metrics_view)
+    app.server.after_request(metrics.finish_request)
+    return metrics
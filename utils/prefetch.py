@@ -0,0 +1,89 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .catalog import get_catalog
+from .dataset_cache import get_dataset_cache
+
+
+class Prefetcher:
+    """ Warm the dataset cache for the dates around the selected one in the background.
+
+    The neighbouring meteogram files are opened and loaded into memory by a small thread
+    pool, so stepping through a campaign day by day does not pay a cold open each time.
+    """
+
+    def __init__(self, config : dict, depth : int = 1, max_workers : int = 1):
+        """
+        :param config: app configuration
+        :param depth: number of files before and after the selected date that are prefetched
+        :param max_workers: number of threads loading files, kept small so that the
+            threads serving requests are not starved
+        """
+        self.config = config
+        cache = get_dataset_cache(config)
+        # never prefetch more files than fit into the cache next to the selected one,
+        # files that would exceed its memory budget are skipped when they are opened
+        self.depth = max(0, min(depth, (cache.max_entries - 1) // 2))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, path : str, seldate : str):
+        """ Queue the neighbours of a date for loading
+
+        :param path: path to the data
+        :param seldate: selected date as YYYY-MM-DD
+        """
+        if self.depth == 0:
+            return
+        # the catalog only lists the files that can be read, the directory is not scanned again
+        files = get_catalog(self.config, path).files()
+        dates = list(files)
+        if seldate not in files:
+            return
+        # the shown file is evicted last, the neighbours are only added if they fit next to it
+        get_dataset_cache(self.config).touch(files[seldate])
+        idx = dates.index(seldate)
+        # the next days first, that is the direction users usually step in
+        neighbours = dates[idx + 1:idx + 1 + self.depth] + dates[max(0, idx - self.depth):idx][::-1]
+        for neighbour in neighbours:
+            filename = files[neighbour]
+            with self._lock:
+                if filename in self._pending:
+                    continue
+                self._pending.add(filename)
+            self._executor.submit(self._warm, filename)
+
+    def _warm(self, filename : str):
+        cache = get_dataset_cache(self.config)
+        try:
+            # a neighbour that does not fit into the memory budget next to the cached files
+            # is skipped, it would push the shown file out of the cache
+            ds = cache.warm(filename)
+            # a lazily opened file is only read when a graph needs it, loading it
+            # completely would defeat the bounded memory of the chunked mode
+            if ds is not None and not cache.lazy:
+                ds.load()
+        except (OSError, ValueError):
+            # a broken or vanished file is reported when it is actually selected
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard(filename)
+
+
+_prefetcher = None
+
+
+def get_prefetcher(config : dict) -> Prefetcher:
+    """ Return the prefetcher shared by all callbacks, creating it on first use
+
+    :param config: app configuration, the prefetcher is configured in the [prefetch] table
+    :return: shared Prefetcher
+    """
+    global _prefetcher
+    if _prefetcher is None:
+        prefetch_config = config.get('prefetch', {})
+        depth = prefetch_config.get('depth', 1) if prefetch_config.get('enabled', True) else 0
+        _prefetcher = Prefetcher(config, depth=depth, max_workers=prefetch_config.get('workers', 1))
+    return _prefetcher
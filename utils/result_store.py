@@ -0,0 +1,269 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .dataset_cache import file_identity
+from .metrics import timed, count
+from .binary import encode_binary, decode_binary
+from .shared_cache import get_shared_cache
+
+
+class ResultStore:
+    """ Server side store for the results of the data callbacks.
+
+    Results are kept in an in-process LRU cache. If a shared cache is given, results are
+    also kept there, so that they can be shared between worker processes and a result
+    evicted from memory is read back from disk.
+    """
+
+    def __init__(self, max_entries : int = 64, shared=None):
+        """
+        :param max_entries: maximum number of results kept in memory
+        :param shared: SharedCache the results are also written to, None to keep results in memory only
+        """
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key : str) -> bool:
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self.shared is not None and key in self.shared
+
+    def get(self, key : str):
+        """ Return the result stored under key
+
+        :param key: key returned by put
+        :return: stored result or None if it is not (or no longer) available
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.shared is None:
+            return None
+        value = self.shared.get(key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def put(self, key : str, value) -> str:
+        """ Store a result
+
+        :param key: key of the result
+        :param value: gridded dictionary of arrays
+        :return: the key
+        """
+        self._remember(key, value)
+        # the data callbacks usually got the result from the shared cache or stored it there already
+        if self.shared is not None and key not in self.shared:
+            self.shared.put(key, value)
+        return key
+
+    def _remember(self, key : str, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_store = None
+
+
+def get_result_store(config : dict) -> ResultStore:
+    """ Return the result store shared by all callbacks, creating it on first use
+
+    :param config: app configuration, the store is configured in the [store] table and
+        writes to the shared cache of the [shared_cache] table if that is enabled
+    :return: shared ResultStore
+    """
+    global _store
+    if _store is None:
+        _store = ResultStore(max_entries=config.get('store', {}).get('max_entries', 64),
+                             shared=get_shared_cache(config))
+    return _store
+
+
+def server_side(config : dict) -> bool:
+    """ Check if results are kept on the server instead of being sent to the browser
+
+    :param config: app configuration
+    :return: True if the [store] mode is 'server'
+    """
+    return config.get('store', {}).get('mode', 'client') == 'server'
+
+
+def binary_transport(config : dict) -> bool:
+    """ Check if results are sent to the browser as base64 typed arrays instead of json lists
+
+    :param config: app configuration
+    :return: True if the [store] mode is 'binary'
+    """
+    return config.get('store', {}).get('mode', 'client') == 'binary'
+
+
+def binary_dtype(config : dict) -> str:
+    """ Return the dtype the values are sent as in binary mode
+
+    :param config: app configuration
+    :return: 'float32' or 'float64' from [store] binary_dtype
+    """
+    return config.get('store', {}).get('binary_dtype', 'float32')
+
+
+def result_key(filename, *params) -> str:
+    """ Build the key of a result from the identity of the source files and the
+    parameters that were used to compute it
+
+    :param filename: path to the meteogram file or list of paths for a date range
+    :param params: further parameters the result depends on
+    :return: hex digest usable as key
+    """
+    filenames = filename if isinstance(filename, (list, tuple)) else [filename]
+    identities = tuple(file_identity(name) for name in filenames)
+    return hashlib.sha1(repr(identities + params).encode()).hexdigest()
+
+
+def has_result(config : dict, key : str) -> bool:
+    """ Check if a result is already available on the server
+
+    :param config: app configuration
+    :param key: key of the result
+    :return: True if the data callback can return the key without recomputing
+    """
+    if server_side(config) and key in get_result_store(config):
+        count('result_store_hits')
+        return True
+    return False
+
+
+def encode_grid(grid : dict) -> dict:
+    """ Convert a gridded result with NumPy arrays to lists that can be sent as json
+
+    :param grid: dictionary of arrays, possibly nested
+    :return: dictionary of lists, times are written as iso strings
+    """
+    encoded = {}
+    for name, values in grid.items():
+        if isinstance(values, dict):
+            encoded[name] = encode_grid(values)
+        elif np.issubdtype(values.dtype, np.datetime64):
+            encoded[name] = np.datetime_as_string(values, unit='ms').tolist()
+        else:
+            encoded[name] = values.tolist()
+    return encoded
+
+
+def decode_grid(data : dict) -> dict:
+    """ Convert a gridded result received as json back to NumPy arrays
+
+    :param data: dictionary of lists as written by encode_grid
+    :return: dictionary of arrays
+    """
+    grid = {}
+    for name, values in data.items():
+        if isinstance(values, dict):
+            grid[name] = decode_grid(values)
+        elif name in ('time', 'end'):
+            grid[name] = np.asarray(values, dtype='datetime64[ns]')
+        else:
+            # missing values are sent as null and become NaN again
+            grid[name] = np.asarray(values, dtype=float)
+    return grid
+
+
+def result_reference(key : str, window=None) -> dict:
+    """ Content of the intermediate dcc.Store for a result kept on the server, and the
+    fields sent along with a result that is sent to the browser
+
+    The time window is sent along so that the data callback can compute the result again
+    if it is evicted from the store before a graph is drawn from it, and so that the live
+    mode leaves a zoomed graph alone.
+
+    :param key: key of the result
+    :param window: time window the result was computed for or None for the entire days
+    :return: dictionary with the key and the window as iso strings
+    """
+    if window is not None:
+        window = [str(np.datetime_as_string(np.datetime64(time, 'ns'), unit='ns')) for time in window]
+    return {'key': key, 'window': window}
+
+
+def result_window(data):
+    """ Get the time window of a result from the content of a dcc.Store
+
+    :param data: content of the dcc.Store as returned by result_reference
+    :return: tuple of start and end as numpy datetime64 or None
+    """
+    if not isinstance(data, dict) or not data.get('window'):
+        return None
+    start, end = data['window']
+    return np.datetime64(start, 'ns'), np.datetime64(end, 'ns')
+
+
+def result_missing(config : dict, data) -> bool:
+    """ Check if the result a dcc.Store refers to is no longer kept on the server
+
+    A missing result is not the same as no data: the store still refers to it, so the
+    graph callback asks the data callback to compute it again instead of drawing the
+    error figure.
+
+    :param config: app configuration
+    :param data: content of the dcc.Store
+    :return: True in server mode if the result was evicted
+    """
+    return server_side(config) and data is not None and result_id(data) not in get_result_store(config)
+
+
+def store_result(config : dict, key : str, result, window=None):
+    """ Prepare a result for the intermediate dcc.Store
+
+    :param config: app configuration
+    :param key: key of the result
+    :param result: gridded dictionary of arrays returned by a data callback
+    :param window: time window the result was computed for, kept with the key
+    :return: key and window of the result in server mode, otherwise the result as json with them
+    """
+    with timed('serialize'):
+        if server_side(config):
+            get_result_store(config).put(key, result)
+            return result_reference(key, window)
+        # the arrays must be converted to lists so that they can be stored in the browser,
+        # the key is sent along so that the figures built from the result can be cached
+        if binary_transport(config):
+            return dict(encode_binary(result, binary_dtype(config)), **result_reference(key, window))
+        return dict(encode_grid(result), **result_reference(key, window))
+
+
+def load_result(config : dict, data):
+    """ Get the result of a data callback back from the content of a dcc.Store
+
+    :param config: app configuration
+    :param data: content of the dcc.Store
+    :return: gridded dictionary or None if the result is not available
+    """
+    if data is None:
+        return None
+    with timed('serialize'):
+        if server_side(config):
+            return get_result_store(config).get(result_id(data))
+        data = {name: values for name, values in data.items() if name not in ('key', 'window')}
+        if binary_transport(config):
+            return decode_binary(data)
+        return decode_grid(data)
+
+
+def result_id(data):
+    """ Get the key of a result from the content of a dcc.Store without decoding it
+
+    :param data: content of the dcc.Store
+    :return: key of the result or None if there is no result
+    """
+    if isinstance(data, dict):
+        return data.get('key')
+    return data
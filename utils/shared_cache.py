@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .config_utils import server_config
+from .metrics import timed, count
+
+
+def shared_cache_config(config : dict) -> dict:
+    """ Return the shared cache settings with defaults filled in
+
+    :param config: app configuration, the settings are read from the [shared_cache] table
+    :return: dictionary with enabled, directory and max_disk_mb
+    """
+    shared = config.get('shared_cache', {})
+    # the server mode of the result store with several workers needs it: the browser only holds the
+    # key of a result, and the graph callback may run in another worker than the data callback
+    needed = config.get('store', {}).get('mode', 'client') == 'server' and server_config(config)['workers'] > 1
+    return {'enabled': shared.get('enabled', False) or needed,
+            'directory': shared.get('directory', '') or os.path.join(tempfile.gettempdir(), 'icon_dashboard_cache'),
+            'max_disk_mb': shared.get('max_disk_mb', 2048)}
+
+
+class SharedCache:
+    """ On-disk cache of the gridded results of the data functions, shared by all worker processes.
+
+    Every result is a directory named after its key with one .npy file per array. The key is
+    built from the path, modification time and size of the files, so a changed file is
+    never read from the cache. The server mode of the result store keeps its results here as well. Arrays are memory-mapped when they are read, so the
+    workers share the pages of a result in the page cache instead of each holding a copy.
+    """
+
+    def __init__(self, directory : str, max_disk_mb : float = 2048):
+        """
+        :param directory: directory of the cache, the same for all workers
+        :param max_disk_mb: maximum size of the cache in MB, the least recently used results are removed
+        """
+        self.directory = directory
+        self.max_disk_bytes = max_disk_mb * 1024**2
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key : str) -> str:
+        return os.path.join(self.directory, key)
+
+    def __contains__(self, key : str) -> bool:
+        return os.path.exists(os.path.join(self._path(key), 'index.json'))
+
+    def get(self, key : str):
+        """ Return the result stored under key
+
+        :param key: key of the result
+        :return: gridded dictionary of read-only arrays or None if it is not in the cache
+        """
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, 'index.json')) as fp:
+                index = json.load(fp)
+            grid = {}
+            for name, filename in index.items():
+                # the memory map is viewed as a plain array so that it pickles like one
+                values = np.load(os.path.join(path, filename), mmap_mode='r').view(np.ndarray)
+                _set_nested(grid, name.split('/'), values)
+            # the modification time of the directory orders the results for pruning
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # not written yet, or removed by another worker while it was read
+            return None
+        return grid
+
+    def put(self, key : str, grid : dict):
+        """ Store a result, a result another worker stored first is kept
+
+        :param key: key of the result
+        :param grid: gridded dictionary of arrays, possibly nested
+        """
+        # the result is written to a temporary directory first so that other workers never
+        # read partial results, renaming it is atomic
+        tmpdir = tempfile.mkdtemp(dir=self.directory, suffix='.tmp')
+        index = {}
+        for i, (name, values) in enumerate(_flatten(grid)):
+            filename = f'{i}.npy'
+            np.save(os.path.join(tmpdir, filename), np.asarray(values))
+            index[name] = filename
+        with open(os.path.join(tmpdir, 'index.json'), 'w') as fp:
+            json.dump(index, fp)
+        try:
+            os.rename(tmpdir, self._path(key))
+        except OSError:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            return
+        self._prune()
+
+    def _prune(self):
+        """ Remove the least recently used results until the cache is within its budget """
+        entries = [entry for entry in os.scandir(self.directory)
+                   if entry.is_dir() and not entry.name.endswith('.tmp')]
+        sizes = {entry.path: sum(f.stat().st_size for f in os.scandir(entry.path)) for entry in entries}
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        total = sum(sizes.values())
+        while entries and total > self.max_disk_bytes:
+            entry = entries.pop(0)
+            total -= sizes[entry.path]
+            # arrays that are still mapped by a worker stay readable after the removal
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _flatten(grid : dict, prefix : str = ''):
+    """ Pairs of the slash separated name and the array of every array of a nested dictionary """
+    for name, values in grid.items():
+        if isinstance(values, dict):
+            yield from _flatten(values, prefix + name + '/')
+        else:
+            yield prefix + name, values
+
+
+def _set_nested(grid : dict, names : list, values):
+    for name in names[:-1]:
+        grid = grid.setdefault(name, {})
+    grid[names[-1]] = values
+
+
+_cache = None
+
+
+def get_shared_cache(config : dict):
+    """ Return the shared cache of this process, creating it on first use
+
+    :param config: app configuration, the cache is configured in the [shared_cache] table
+    :return: SharedCache or None if the shared cache is not enabled
+    """
+    global _cache
+    shared = shared_cache_config(config)
+    if not shared['enabled']:
+        return None
+    if _cache is None:
+        _cache = SharedCache(shared['directory'], max_disk_mb=shared['max_disk_mb'])
+    return _cache
+
+
+def shared_result(config : dict, key : str, compute):
+    """ Return a result from the shared cache, or compute it and store it for the other workers
+
+    :param config: app configuration
+    :param key: key of the result as returned by result_key
+    :param compute: function without arguments computing the gridded result
+    :return: gridded dictionary of arrays or None if compute returns None
+    """
+    cache = get_shared_cache(config)
+    if cache is None:
+        return compute()
+    with timed('open'):
+        grid = cache.get(key)
+    if grid is not None:
+        count('shared_cache_hits')
+        return grid
+    count('shared_cache_misses')
+    grid = compute()
+    if grid is not None:
+        with timed('serialize'):
+            cache.put(key, grid)
+    return grid
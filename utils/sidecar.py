@@ -0,0 +1,107 @@
+import os
+import shutil
+
+from .derived_fields import add_precip_fields, add_hydrometeor_totals
+
+# file endings of the supported sidecar formats
+SUFFIXES = {'zarr': '.zarr', 'netcdf': '.sidecar.nc'}
+
+
+def sidecar_config(config : dict) -> dict:
+    """ Return the sidecar settings with defaults filled in
+
+    :param config: app configuration, the settings are read from the [sidecar] table
+    :return: dictionary with the sidecar settings
+    """
+    sidecar = config.get('sidecar', {})
+    return {'enabled': sidecar.get('enabled', False),
+            'format': sidecar.get('format', 'netcdf'),
+            'directory': sidecar.get('directory', ''),
+            'time_chunk': sidecar.get('time_chunk', 1440),
+            'complevel': sidecar.get('complevel', 4)}
+
+
+def sidecar_path(config : dict, filename : str) -> str:
+    """ Path of the sidecar belonging to a meteogram file
+
+    :param config: app configuration
+    :param filename: path to the meteogram netcdf file
+    :return: path of the sidecar, next to the source file unless a directory is configured
+    """
+    settings = sidecar_config(config)
+    directory = settings['directory'] or os.path.dirname(filename)
+    name = os.path.splitext(os.path.basename(filename))[0] + SUFFIXES[settings['format']]
+    return os.path.join(directory, name)
+
+
+def is_fresh(sidecar : str, filename : str) -> bool:
+    """ Check if a sidecar exists and is newer than its source
+
+    :param sidecar: path to the sidecar
+    :param filename: path to the meteogram netcdf file
+    :return: True if the sidecar can be used instead of the source
+    """
+    return os.path.exists(sidecar) and os.path.getmtime(sidecar) > os.path.getmtime(filename)
+
+
+def preferred_source(config : dict, filename : str) -> tuple:
+    """ Choose the file the data callbacks read for a meteogram file
+
+    :param config: app configuration
+    :param filename: path to the meteogram netcdf file
+    :return: tuple of the path to open and the xarray engine, None for the default engine
+    """
+    settings = sidecar_config(config)
+    if settings['enabled']:
+        sidecar = sidecar_path(config, filename)
+        if is_fresh(sidecar, filename):
+            return sidecar, 'zarr' if settings['format'] == 'zarr' else None
+    return filename, None
+
+
+def build_sidecar(config : dict, filename : str, force : bool = False) -> bool:
+    """ Convert a meteogram file to a chunked and compressed sidecar with the derived
+    precipitation and hydrometeor fields already computed
+
+    :param config: app configuration
+    :param filename: path to the meteogram netcdf file
+    :param force: rebuild the sidecar even if it is up to date
+    :return: True if the sidecar was written, False if it was already up to date
+    """
+    settings = sidecar_config(config)
+    target = sidecar_path(config, filename)
+    if not force and is_fresh(target, filename):
+        return False
+
+    import xarray as xr
+
+    with xr.open_dataset(filename) as ds:
+        if all(var in ds for var in ['RAIN_GSP', 'RAIN_CON', 'SNOW_GSP', 'SNOW_CON']):
+            ds = add_precip_fields(ds)
+        ds = add_hydrometeor_totals(ds)
+
+        # chunk along time only, so that a variable is read with few contiguous reads
+        encoding = {}
+        for name, var in ds.data_vars.items():
+            chunks = tuple(min(settings['time_chunk'], size) if dim == 'time' else size
+                           for dim, size in var.sizes.items())
+            if settings['format'] == 'zarr':
+                encoding[name] = {'chunks': chunks} if chunks else {}
+            elif chunks:
+                encoding[name] = {'zlib': True, 'complevel': settings['complevel'], 'chunksizes': chunks}
+
+        # write next to the target first so that readers never see a partial sidecar
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        tmpname = target + '.tmp'
+        if settings['format'] == 'zarr':
+            shutil.rmtree(tmpname, ignore_errors=True)
+            ds.to_zarr(tmpname, mode='w', encoding=encoding, consolidated=True)
+        else:
+            ds.to_netcdf(tmpname, encoding=encoding)
+
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(tmpname, target)
+    # a directory keeps the time of its last change, mark the sidecar as written now
+    os.utime(target)
+    return True
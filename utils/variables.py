@@ -0,0 +1,109 @@
+import functools
+
+from .derived_fields import MASS_SPECIES, NUMBER_SPECIES
+
+# labels of the variables shown in the dropdown menus of each panel, in the order shown
+VARS_1D = {
+    'T2M': '2m Temperature',
+    'P_SFC': 'Surface pressure',
+    'TQV': 'IWV',
+    'TQC': 'LWP',
+    'TQI': 'IWP',
+}
+
+VARS_TIMEHEIGHT = {
+    'CLC': 'Cloud cover',
+    'T': 'Temperature',
+    'RHO': 'Density',
+    'P': 'Pressure',
+    'REL_HUM': 'Relative humidity',
+    'U': 'Horizontal wind U',
+    'V': 'Horizontal wind V',
+}
+
+VARS_HYDROMETEORS = {
+    'QV': 'Specific humidity',
+    'QC': 'Cloud water mass',
+    'QI': 'Cloud ice mass',
+    'QR': 'Rain mass',
+    'QS': 'Snow mass',
+    'QG': 'Graupel mass',
+    'QH': 'Hail mass',
+    'total mass': 'Total mass',
+    'QNC': 'Cloud water number conc.',
+    'QNI': 'Cloud ice number conc.',
+    'QNR': 'Rain number conc.',
+    'QNS': 'Snow number conc.',
+    'QNG': 'Graupel number conc.',
+    'QNH': 'Hail number conc.',
+    'total number': 'Total number conc.',
+}
+
+
+# how each variable is shown, used by the figures built on the server and in the browser
+STYLE_1D = {
+    'T2M': {'yaxis_title': 'K'},
+    'P_SFC': {'yaxis_title': 'hPa'},
+    'TQV': {'yaxis_title': 'kg m-2'},
+    'TQC': {'yaxis_title': 'kg m-2'},
+    'TQI': {'yaxis_title': 'kg m-2'},
+}
+
+STYLE_TIMEHEIGHT = {
+    'CLC': {'colorbar': '0 or 1', 'colorscale': 'viridis_r', 'zmid': None},
+    'T': {'colorbar': 'T [K]', 'colorscale': 'Turbo', 'zmid': None},
+    'RHO': {'colorbar': 'Rho [kg/m^3]', 'colorscale': 'viridis_r', 'zmid': None},
+    'P': {'colorbar': 'P [Pa]', 'colorscale': 'viridis_r', 'zmid': None},
+    'REL_HUM': {'colorbar': ' Rel. hum. [%]', 'colorscale': 'viridis_r', 'zmid': None},
+    # the wind is centred around 0
+    'U': {'colorbar': 'U [m/s]', 'colorscale': 'PRGn', 'zmid': 0},
+    'V': {'colorbar': 'V [m/s]', 'colorscale': 'PRGn', 'zmid': 0},
+}
+
+# mass fields are shown as log10 with fixed contour levels
+LOG_CONTOURS = {'start': -8, 'end': -2, 'size': 1}
+STYLE_HYDROMETEORS = {'QV': {'colorbar': '[kg/kg]', 'contours': None}}
+STYLE_HYDROMETEORS.update({var: {'colorbar': 'log10 [kg/kg]', 'contours': LOG_CONTOURS}
+                           for var in MASS_SPECIES + ['total mass'] if var != 'QV'})
+STYLE_HYDROMETEORS.update({var: {'colorbar': '1/kg', 'contours': None}
+                           for var in NUMBER_SPECIES + ['total number']})
+
+
+@functools.lru_cache(maxsize=None)
+def variable_meta() -> dict:
+    """ Styles of all variables, sent to the browser for the clientside callbacks
+
+    :return: dictionary with the styles of the variables of each panel, the named
+        colorscales are resolved because plotly.js does not know all names of plotly
+    """
+    import plotly.graph_objects as go
+
+    timeheight = {var: dict(style, colorscale=go.Contour(colorscale=style['colorscale']).colorscale)
+                  for var, style in STYLE_TIMEHEIGHT.items()}
+    return {'vars1d': STYLE_1D, 'timeheight': timeheight, 'hydrometeors': STYLE_HYDROMETEORS,
+            'hydrometeors_colorscale': go.Contour(colorscale='jet').colorscale}
+
+
+def with_derived(variables : set) -> set:
+    """ Add the fields that are computed from the variables of a file
+
+    :param variables: variables in the file
+    :return: variables including the hydrometeor totals that can be computed
+    """
+    variables = set(variables)
+    if variables.intersection(MASS_SPECIES):
+        variables.add('total mass')
+    if variables.intersection(NUMBER_SPECIES):
+        variables.add('total number')
+    return variables
+
+
+def dropdown_options(labels : dict, available : set = None) -> list:
+    """ Options of a dropdown menu
+
+    :param labels: variables and their labels
+    :param available: variables that exist in the data, None to show all variables
+    :return: list of options for dcc.Dropdown
+    """
+    return [{'label': label, 'value': var} for var, label in labels.items()
+            if available is None or var in available]
@@ -0,0 +1,27 @@
+""" WSGI entry point of the dashboard for production servers
+
+    gunicorn -c gunicorn.conf.py        # workers and threads from the [server] table
+    waitress-serve --port 8050 wsgi:server
+    python wsgi.py                      # waitress with the [server] table
+
+The configuration is read from the file given in the DASHBOARD_CONFIG environment
+variable, assets/config.toml by default. Every worker process builds its own app, set
+enabled = true in the [shared_cache] table so that the workers share the loaded days.
+"""
+
+import os
+
+from app import create_app
+from utils.config_utils import load_config, server_config
+
+CONFIG_PATH = os.environ.get('DASHBOARD_CONFIG', './assets/config.toml')
+
+app = create_app(CONFIG_PATH)
+server = app.server
+
+
+if __name__ == '__main__':
+    from waitress import serve
+
+    settings = server_config(load_config(CONFIG_PATH))
+    serve(server, host=settings['host'], port=settings['port'], threads=settings['threads'])